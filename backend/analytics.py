@@ -0,0 +1,221 @@
+"""Vectorized spending analytics.
+
+A user's expenses are loaded once as columns and every statistic is computed
+with pandas/NumPy group and window operations rather than per-expense Python
+loops, so the cost is dominated by fetching the rows. Totals and distributions
+cover every row; the monthly and daily series end at the latest expense and
+are capped at ``MONTHLY_SERIES_MONTHS`` / ``ROLLING_SERIES_DAYS``, so one
+mistyped year cannot turn them into hundreds of thousands of rows.
+"""
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from expense_schema import AMOUNT_FIELDS, date_range
+
+ANALYTICS_FIELDS = ["date", "category", "amount", "notes"]
+DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+PERCENTILES = [0.5, 0.75, 0.9, 0.99]
+MONTHLY_SERIES_MONTHS = int(os.environ.get('ANALYTICS_SERIES_MONTHS', 24))
+ROLLING_SERIES_DAYS = int(os.environ.get('ANALYTICS_SERIES_DAYS', 365))
+
+
+async def load_expense_frame(db, user_id: str, start_date: Optional[str], end_date: Optional[str]) -> pd.DataFrame:
+    query: Dict = {"user_id": user_id}
+    if start_date or end_date:
+        query["date"] = date_range(start_date, end_date)
+
+    projection = {field: 1 for field in ANALYTICS_FIELDS + AMOUNT_FIELDS}
+    projection["_id"] = 0
+    documents = await db.expenses.find(query, projection, batch_size=10000).to_list(None)
+    return expense_frame(documents)
+
+
+def expense_frame(documents: List[dict]) -> pd.DataFrame:
+    columns = {
+        field: [document.get(field) for document in documents]
+        for field in ANALYTICS_FIELDS + ["amount_cents"]
+    }
+    try:
+        # Stored datetimes (or ISO strings) convert in one pass. The column
+        # keeps pandas' own unit: np.array on datetime objects, or a
+        # datetime64[D] column pandas has to cast, is several times slower
+        dates = pd.DatetimeIndex(columns["date"]).to_numpy()
+    except (ValueError, TypeError, OverflowError):
+        # Malformed or out-of-range dates: fall back to the slower, forgiving parser
+        dates = pd.to_datetime(pd.Series(columns["date"], dtype=object), format="%Y-%m-%d",
+                               errors="coerce").to_numpy()
+    # Integer cents, or a float amount on documents not yet migrated
+    amounts = np.array(columns["amount_cents"], dtype=np.float64) / 100
+    legacy = np.isnan(amounts)
+    if legacy.any():
+        amounts[legacy] = pd.to_numeric(pd.Series(columns["amount"], dtype=object)[legacy],
+                                        errors="coerce").to_numpy(dtype=np.float64)
+    frame = pd.DataFrame({
+        "date": dates,
+        "category": pd.Series(columns["category"], dtype=object),
+        "amount": amounts,
+        "notes": pd.Series(columns["notes"], dtype=object),
+    })
+    return frame.dropna(subset=["date", "amount"]).reset_index(drop=True)
+
+
+def trailing_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Mean of the last ``window`` values at each position (shorter at the start)."""
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+    ends = np.arange(1, len(values) + 1)
+    starts = np.maximum(ends - window, 0)
+    return (cumulative[ends] - cumulative[starts]) / (ends - starts)
+
+
+def series_start(first: int, last: int, length: int, lead: int) -> Tuple[int, int]:
+    """First (calendar, output) positions of a series of ``length`` ending at ``last``.
+
+    The calendar starts ``lead`` positions earlier so that window statistics
+    of the first output rows still see their full window.
+    """
+    start = max(first, last - length + 1)
+    return max(first, start - lead), start
+
+
+def compute_analytics(frame: pd.DataFrame, top_n: int = 10,
+                      series_months: int = MONTHLY_SERIES_MONTHS,
+                      series_days: int = ROLLING_SERIES_DAYS) -> dict:
+    if frame.empty:
+        return {
+            "total": 0.0,
+            "count": 0,
+            "monthly": [],
+            "categories": {},
+            "rolling": [],
+            "day_of_week": [],
+            "top_notes": [],
+        }
+
+    days = frame["date"].to_numpy(dtype="datetime64[D]")
+    amounts = frame["amount"].to_numpy(dtype=np.float64)
+    day_numbers = days.astype(np.int64)
+
+    # One gap-free daily calendar covers both series: the latest
+    # ``series_days`` days plus 29 before them for the 30-day average, and
+    # the latest ``series_months`` months plus one before them for the trend
+    first_day, last_day = int(day_numbers.min()), int(day_numbers.max())
+    last_month = int(np.datetime64(last_day, "D").astype("datetime64[M]").astype(np.int64))
+    calendar_month, first_month = series_start(
+        int(np.datetime64(first_day, "D").astype("datetime64[M]").astype(np.int64)),
+        last_month, series_months, 1,
+    )
+    rolling_calendar, rolling_start = series_start(first_day, last_day, series_days, 29)
+    calendar_start = max(first_day, min(
+        rolling_calendar, int(np.datetime64(calendar_month, "M").astype("datetime64[D]").astype(np.int64))
+    ))
+    in_calendar = day_numbers >= calendar_start
+    daily = np.bincount(day_numbers[in_calendar] - calendar_start, weights=amounts[in_calendar])
+    calendar_days = (np.arange(len(daily)) + calendar_start).astype("datetime64[D]")
+
+    # Month-over-month trend
+    calendar_months = calendar_days.astype("datetime64[M]").astype(np.int64)
+    in_series = calendar_months >= calendar_month
+    monthly = np.bincount(calendar_months[in_series] - calendar_month, weights=daily[in_series])
+    previous = np.concatenate(([np.nan], monthly[:-1]))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = np.where(previous > 0, (monthly / previous - 1) * 100, np.nan)
+    skip = first_month - calendar_month
+    monthly, change = monthly[skip:], change[skip:]
+    month_labels = np.datetime_as_string(
+        (np.arange(len(monthly)) + first_month).astype("datetime64[M]"), unit="M"
+    )
+    monthly_rows = [
+        {
+            "month": str(month),
+            "total": round(float(total), 2),
+            "change_pct": None if np.isnan(pct) else round(float(pct), 2),
+        }
+        for month, total, pct in zip(month_labels, monthly, change)
+    ]
+
+    # Per-category distribution. Amounts are whole cents, so (category,
+    # cents) packs into one integer key and a single sort lays out every
+    # category's amounts as an ordered run to interpolate quantiles in
+    codes, names = pd.factorize(frame["category"], sort=True)
+    known = codes >= 0
+    codes, category_amounts = codes[known], amounts[known]
+    totals = np.bincount(codes, weights=category_amounts, minlength=len(names))
+    counts = np.bincount(codes, minlength=len(names))
+    cents = np.rint(category_amounts * 100).astype(np.int64)
+    low = cents.min() if len(cents) else 0
+    span = (cents.max() - low + 1) if len(cents) else 1
+    ordered = (np.sort(codes * span + (cents - low)) % span + low) / 100
+    run_starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    quantiles = {}
+    for q in PERCENTILES:
+        # Linear interpolation, as numpy's and pandas' default
+        position = (counts - 1) * q
+        low = np.floor(position).astype(np.int64)
+        high = np.minimum(low + 1, counts - 1)
+        quantiles[q] = ordered[run_starts + low] + (ordered[run_starts + high] - ordered[run_starts + low]) * (position - low)
+    categories = {
+        str(name): {
+            "total": round(float(totals[code]), 2),
+            "count": int(counts[code]),
+            "mean": round(float(totals[code] / counts[code]), 2),
+            **{f"p{int(q * 100)}": round(float(quantiles[q][code]), 2) for q in PERCENTILES},
+        }
+        for code, name in enumerate(names)
+    }
+
+    # Rolling daily averages
+    rolling = daily[rolling_calendar - calendar_start:]
+    skip = rolling_start - rolling_calendar
+    rolling_7 = trailing_mean(rolling, 7)[skip:]
+    rolling_30 = trailing_mean(rolling, 30)[skip:]
+    day_labels = np.datetime_as_string(calendar_days[rolling_start - calendar_start:])
+    rolling_rows = [
+        {"date": str(day), "total": round(float(total), 2), "avg_7d": round(float(r7), 2), "avg_30d": round(float(r30), 2)}
+        for day, total, r7, r30 in zip(day_labels, rolling[skip:], rolling_7, rolling_30)
+    ]
+
+    # Day-of-week pattern; 1970-01-01 was a Thursday (Monday == 0)
+    weekday = (day_numbers + 3) % 7
+    weekday_totals = np.bincount(weekday, weights=amounts, minlength=7)
+    weekday_counts = np.bincount(weekday, minlength=7)
+    day_of_week = [
+        {
+            "day": DAY_NAMES[i],
+            "total": round(float(weekday_totals[i]), 2),
+            "count": int(weekday_counts[i]),
+            "mean": round(float(weekday_totals[i] / weekday_counts[i]), 2) if weekday_counts[i] else 0.0,
+        }
+        for i in range(7)
+    ]
+
+    # Most frequent merchants / notes; normalize each distinct note only once
+    note_codes, raw_notes = pd.factorize(frame["notes"])
+    present = note_codes >= 0
+    top_notes = []
+    if present.any():
+        normalized = pd.Index(raw_notes).astype(str).str.strip().str.lower()
+        # Merge raw notes that normalize alike, mapping codes rather than rows
+        merged, notes = pd.factorize(normalized)
+        note_codes = merged[note_codes[present]]
+        keep = notes != ""
+        notes = notes.tolist()
+        note_counts = np.bincount(note_codes, minlength=len(notes))
+        note_totals = np.bincount(note_codes, weights=amounts[present], minlength=len(notes))
+        order = np.lexsort((-note_totals, -note_counts))
+        top_notes = [
+            {"note": notes[i], "count": int(note_counts[i]), "total": round(float(note_totals[i]), 2)}
+            for i in order if keep[i]
+        ][:top_n]
+
+    return {
+        "total": round(float(amounts.sum()), 2),
+        "count": int(len(amounts)),
+        "monthly": monthly_rows,
+        "categories": categories,
+        "rolling": rolling_rows,
+        "day_of_week": day_of_week,
+        "top_notes": top_notes,
+    }
@@ -0,0 +1,136 @@
+"""Vectorized analytics vs the equivalent per-expense Python loops.
+
+Generates a synthetic expense history in the stored form (BSON-style
+``datetime`` dates at midnight, integer ``amount_cents``) and times
+``analytics.compute_analytics``
+(plus the column conversion in ``expense_frame``) against a straightforward
+dict-and-loop implementation of the same statistics.
+
+    python benchmarks/analytics_engine.py --rows 100000
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import DefaultDict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import PERCENTILES, compute_analytics, expense_frame  # noqa: E402
+
+CATEGORIES = ["Groceries", "Dining", "Rent", "Transport", "Utilities", "Shopping", "Travel", "Health"]
+MERCHANTS = [f"Merchant {i}" for i in range(200)]
+
+
+def synthetic_expenses(rows: int, days: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    start = datetime.datetime(today.year, today.month, today.day) - datetime.timedelta(days=days)
+    return [
+        {
+            "date": start + datetime.timedelta(days=rng.randrange(days)),
+            "category": rng.choice(CATEGORIES),
+            "amount_cents": round(rng.lognormvariate(3, 1) * 100),
+            "notes": rng.choice(MERCHANTS) if rng.random() < 0.7 else None,
+        }
+        for _ in range(rows)
+    ]
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    # Linear interpolation, as pandas' default
+    position = (len(sorted_values) - 1) * q
+    low = int(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+def loop_analytics(expenses: list, top_n: int = 10) -> dict:
+    monthly: DefaultDict[str, float] = defaultdict(float)
+    by_category: DefaultDict[str, List[float]] = defaultdict(list)
+    daily: DefaultDict[datetime.date, float] = defaultdict(float)
+    weekday_totals = [0.0] * 7
+    weekday_counts = [0] * 7
+    note_counts: Counter = Counter()
+    note_totals: DefaultDict[str, float] = defaultdict(float)
+
+    for expense in expenses:
+        day = expense["date"].date()
+        amount = expense["amount_cents"] / 100
+        monthly[day.strftime("%Y-%m")] += amount
+        by_category[expense["category"]].append(amount)
+        daily[day] += amount
+        weekday_totals[day.weekday()] += amount
+        weekday_counts[day.weekday()] += 1
+        if expense.get("notes"):
+            note = expense["notes"].strip().lower()
+            note_counts[note] += 1
+            note_totals[note] += amount
+
+    categories = {}
+    for category, amounts in by_category.items():
+        amounts.sort()
+        categories[category] = {
+            "total": sum(amounts),
+            "count": len(amounts),
+            "mean": sum(amounts) / len(amounts),
+            **{f"p{int(q * 100)}": percentile(amounts, q) for q in PERCENTILES},
+        }
+
+    first, last = min(daily), max(daily)
+    calendar = [first + datetime.timedelta(days=i) for i in range((last - first).days + 1)]
+    totals = [daily.get(day, 0.0) for day in calendar]
+    rolling = []
+    for i, day in enumerate(calendar):
+        window_7 = totals[max(0, i - 6):i + 1]
+        window_30 = totals[max(0, i - 29):i + 1]
+        rolling.append({"date": day.isoformat(), "avg_7d": sum(window_7) / len(window_7),
+                        "avg_30d": sum(window_30) / len(window_30)})
+
+    months = sorted(monthly)
+    return {
+        "monthly": [
+            {"month": m, "total": monthly[m],
+             "change_pct": (monthly[m] / monthly[months[i - 1]] - 1) * 100 if i else None}
+            for i, m in enumerate(months)
+        ],
+        "categories": categories,
+        "rolling": rolling,
+        "day_of_week": list(zip(weekday_totals, weekday_counts)),
+        "top_notes": sorted(note_counts, key=lambda n: (note_counts[n], note_totals[n]), reverse=True)[:top_n],
+    }
+
+
+def timed(fn, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": round(statistics.median(samples), 1), "min_ms": round(min(samples), 1)}
+
+
+def main(args):
+    expenses = synthetic_expenses(args.rows, args.days)
+    frame = expense_frame(expenses)
+
+    print(json.dumps({
+        "rows": args.rows,
+        "days": args.days,
+        "loop": timed(lambda: loop_analytics(expenses), args.repeat),
+        "vectorized_compute": timed(lambda: compute_analytics(frame), args.repeat),
+        "vectorized_with_frame_build": timed(lambda: compute_analytics(expense_frame(expenses)), args.repeat),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=3 * 365)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
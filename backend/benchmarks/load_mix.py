@@ -0,0 +1,282 @@
+"""Mixed-traffic load test of the API with local stand-ins for every dependency.
+
+Boots ``server.app`` in-process (lifespan included) and drives it through
+httpx's ASGI transport, so it runs on a plain box without network access:
+
+* MongoDB is a local mongod (``--mongo-url``) or, by default, the in-memory
+  ``mongomock_motor`` client;
+* the LLM and Stripe are replaced through ``app.state.providers`` by stubs
+  that sleep for ``--llm-latency-ms`` / ``--stripe-latency-ms``, so the real
+  upstream pools, admission control and metrics stay in the path.
+
+``--concurrency`` virtual users each run ``--requests`` operations drawn from
+``--mix`` and the script prints per-route p50/p95/p99 latency and requests/sec
+as JSON, suitable for diffing between commits. Latencies exclude the network
+and HTTP parsing, which the ASGI transport skips.
+
+    python benchmarks/load_mix.py --concurrency 32 --requests 50
+    python benchmarks/load_mix.py --mongo-url mongodb://localhost:27017 --mix dashboard=1
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from collections import defaultdict
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_MIX = "login=1,create_expense=4,list_expenses=3,dashboard=3,export=1,chat=1"
+CATEGORIES = ["Groceries", "Dining", "Rent", "Transport", "Utilities", "Shopping"]
+PASSWORD = "benchmark-password"
+
+
+class StubChat:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def send_message(self, message):
+        await asyncio.sleep(self.latency)
+        return "Consider moving part of your cash balance into savings."
+
+    async def stream_message(self, text):
+        words = "Consider moving part of your cash balance into savings.".split()
+        for word in words:
+            await asyncio.sleep(self.latency / len(words))
+            yield word + " "
+
+
+def stub_providers(llm_latency: float, stripe_latency: float):
+    from providers import LlmProvider, Providers, StripeProvider, UpstreamPool
+
+    class StubLlmProvider(LlmProvider):
+        def _chat(self, session_id, system_message):
+            return StubChat(llm_latency)
+
+        @staticmethod
+        def _message(text):
+            return SimpleNamespace(text=text)
+
+        def _stream_completion(self, system_message, text):
+            return StubChat(llm_latency).stream_message(text)
+
+    class StubStripeClient:
+        async def create_checkout_session(self, request):
+            await asyncio.sleep(stripe_latency)
+            session_id = f"cs_{uuid.uuid4().hex}"
+            return SimpleNamespace(session_id=session_id, url=f"https://checkout.invalid/{session_id}")
+
+        async def get_checkout_status(self, session_id):
+            await asyncio.sleep(stripe_latency)
+            return SimpleNamespace(status="open", payment_status="unpaid", amount_total=2900, currency="usd")
+
+    class StubStripeProvider(StripeProvider):
+        def _client(self):
+            if self._checkout is None:
+                self._checkout = StubStripeClient()
+            return self._checkout
+
+        async def create_checkout_session(self, **request):
+            return await self.pool.call(self._client().create_checkout_session, request)
+
+    return Providers(
+        llm=StubLlmProvider("benchmark", UpstreamPool(
+            "llm",
+            limit=int(os.environ.get('LLM_MAX_CONCURRENCY', 16)),
+            timeout=60,
+            max_waiting=int(os.environ.get('LLM_MAX_QUEUE', 64)),
+            queue_timeout=float(os.environ.get('LLM_QUEUE_TIMEOUT_SECONDS', 10)),
+        )),
+        stripe=StubStripeProvider("benchmark", UpstreamPool("stripe", limit=8, timeout=20)),
+    )
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    unknown = set(weights) - set(OPERATIONS)
+    if unknown:
+        raise SystemExit(f"Unknown operations in --mix: {', '.join(sorted(unknown))}")
+    return weights
+
+
+def random_expense(rng: random.Random) -> dict:
+    day = datetime.date.today() - datetime.timedelta(days=rng.randrange(365))
+    return {
+        "date": day.isoformat(),
+        "category": rng.choice(CATEGORIES),
+        "amount": round(rng.uniform(2, 300), 2),
+        "payment_method": rng.choice(["Cash", "Credit Card", "Debit Card"]),
+        "notes": rng.choice([None, "Coffee", "Supermarket", "Taxi"]),
+    }
+
+
+async def op_login(client, user, rng):
+    return await client.post("/api/auth/login", json={"email": user["email"], "password": PASSWORD})
+
+
+async def op_create_expense(client, user, rng):
+    return await client.post("/api/expenses", json=random_expense(rng), headers=user["headers"])
+
+
+async def op_list_expenses(client, user, rng):
+    return await client.get("/api/expenses", params={"limit": 50}, headers=user["headers"])
+
+
+async def op_dashboard(client, user, rng):
+    return await client.get("/api/dashboard", headers=user["headers"])
+
+
+async def op_export(client, user, rng):
+    return await client.get("/api/expenses/export", params={"format": "csv"}, headers=user["headers"])
+
+
+async def op_chat(client, user, rng):
+    return await client.post("/api/chat", json={"message": "How much should I save each month?"},
+                             headers=user["headers"])
+
+
+OPERATIONS = {
+    "login": op_login,
+    "create_expense": op_create_expense,
+    "list_expenses": op_list_expenses,
+    "dashboard": op_dashboard,
+    "export": op_export,
+    "chat": op_chat,
+}
+
+
+async def create_users(client, server, count: int, seed_expenses: int, rng: random.Random) -> list:
+    users = []
+    for i in range(count):
+        email = f"bench-{uuid.uuid4().hex[:8]}-{i}@example.com"
+        response = await client.post("/api/auth/signup", json={"email": email, "password": PASSWORD})
+        response.raise_for_status()
+        body = response.json()
+        user = {"email": email, "user_id": body["user_id"],
+                "headers": {"Authorization": f"Bearer {body['token']}"}}
+        await server.db.users.update_one({"user_id": user["user_id"]}, {"$set": {"subscription_status": "active"}})
+        server.user_cache.invalidate(user["user_id"])
+        await client.post("/api/user/setup", headers=user["headers"], json={
+            "bank_accounts": ["Checking"], "credit_cards": ["Rewards Card"],
+            "cash_balance": 2500, "savings_balance": 10000,
+        })
+        if seed_expenses:
+            await client.post("/api/expenses/bulk", headers=user["headers"],
+                              json=[random_expense(rng) for _ in range(seed_expenses)])
+        users.append(user)
+    return users
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def summarize(samples: list, elapsed: float) -> dict:
+    latencies = sorted(ms for ms, _ in samples)
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for _, ok in samples if not ok),
+        "rps": round(len(samples) / elapsed, 1),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "max_ms": round(latencies[-1], 2),
+    }
+
+
+async def run(args) -> dict:
+    import httpx
+    import server
+
+    if args.mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        server.client = AsyncIOMotorClient(args.mongo_url)
+    else:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            raise SystemExit("Install mongomock-motor or pass --mongo-url for a local mongod")
+        server.client = AsyncMongoMockClient()
+    db_name = f"loadtest_{uuid.uuid4().hex[:8]}"
+    server.db = server.client[db_name]
+    server.app.state.providers = stub_providers(args.llm_latency_ms / 1000, args.stripe_latency_ms / 1000)
+
+    rng = random.Random(args.seed)
+    weights = parse_mix(args.mix)
+    names, cumulative = list(weights), list(weights.values())
+    samples = defaultdict(list)
+
+    async with server.app.router.lifespan_context(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=120) as client:
+            users = await create_users(client, server, args.users, args.seed_expenses, rng)
+
+            async def virtual_user(index: int):
+                user_rng = random.Random(args.seed + index)
+                user = users[index % len(users)]
+                for _ in range(args.requests):
+                    name = user_rng.choices(names, cumulative)[0]
+                    started = time.perf_counter()
+                    response = await OPERATIONS[name](client, user, user_rng)
+                    samples[name].append(((time.perf_counter() - started) * 1000, response.status_code < 400))
+
+            started = time.perf_counter()
+            await asyncio.gather(*(virtual_user(i) for i in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+            health = (await client.get("/api/health")).json()
+
+        if args.mongo_url:
+            await server.client.drop_database(db_name)
+
+    return {
+        "config": {
+            "mongo": "mongod" if args.mongo_url else "mongomock",
+            "concurrency": args.concurrency,
+            "requests_per_user": args.requests,
+            "users": args.users,
+            "seed_expenses": args.seed_expenses,
+            "llm_latency_ms": args.llm_latency_ms,
+            "stripe_latency_ms": args.stripe_latency_ms,
+            "mix": weights,
+        },
+        "elapsed_s": round(elapsed, 2),
+        "total": summarize([s for route in samples.values() for s in route], elapsed),
+        "routes": {name: summarize(route, elapsed) for name, route in sorted(samples.items())},
+        "upstreams": health["upstreams"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--mongo-url", default=None, help="local mongod; defaults to in-memory mongomock")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=25, help="operations per virtual user")
+    parser.add_argument("--users", type=int, default=8, help="distinct accounts shared by virtual users")
+    parser.add_argument("--seed-expenses", type=int, default=200, help="expenses bulk-loaded per account")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="weighted operations, e.g. dashboard=3,chat=1")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--stripe-latency-ms", type=float, default=150)
+    parser.add_argument("--bcrypt-rounds", type=int, default=4, help="lower than production to keep logins cheap")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    # Read by server.py at import time
+    os.environ['BCRYPT_ROUNDS'] = str(args.bcrypt_rounds)
+    os.environ.setdefault('LLM_USER_RATE_PER_MINUTE', '100000')
+    os.environ.setdefault('LLM_USER_BURST', '100000')
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
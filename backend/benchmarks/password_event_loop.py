@@ -0,0 +1,86 @@
+"""Event-loop latency while concurrent logins verify bcrypt hashes.
+
+Runs the same burst of ``verify`` calls twice: inline on the event loop (the
+old ``verify_password``) and through ``PasswordService``. A probe task sleeps
+for ``--tick-ms`` in a loop and records how late it wakes up, which is the
+extra latency every other request in the worker would see.
+
+    python benchmarks/password_event_loop.py --logins 32 --rounds 12
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passlib.hash import bcrypt  # noqa: E402
+
+from passwords import PasswordService  # noqa: E402
+
+
+async def probe(lags: list, tick: float, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(tick)
+        lags.append((time.perf_counter() - start - tick) * 1000)
+
+
+async def run_burst(verify, logins: int, tick: float) -> dict:
+    lags: List[float] = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, tick, stop))
+    await asyncio.sleep(tick * 2)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(verify() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await probe_task
+    lags.sort()
+    return {
+        "logins": logins,
+        "wall_ms": round(elapsed * 1000, 1),
+        "logins_per_sec": round(logins / elapsed, 1),
+        "loop_lag_p50_ms": round(statistics.median(lags), 2),
+        "loop_lag_p99_ms": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))], 2),
+        "loop_lag_max_ms": round(lags[-1], 2),
+    }
+
+
+async def main(args):
+    hasher = bcrypt.using(rounds=args.rounds)
+    hashed = hasher.hash(args.password)
+    tick = args.tick_ms / 1000
+
+    async def inline_verify():
+        return hasher.verify(args.password, hashed)
+
+    service = PasswordService(workers=args.workers, queue_limit=args.logins, rounds=args.rounds)
+
+    async def service_verify():
+        return await service.verify(args.password, hashed)
+
+    results = {
+        "rounds": args.rounds,
+        "workers": args.workers,
+        "inline": await run_burst(inline_verify, args.logins, tick),
+        "password_service": await run_burst(service_verify, args.logins, tick),
+    }
+    service.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--tick-ms", type=float, default=5.0)
+    parser.add_argument("--password", default="TestPass123!")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,130 @@
+"""Response serialization cost for large expense and chat-history pages.
+
+Serves the same payload from a throwaway FastAPI app in three ways and times
+requests over httpx's ASGI transport (no network):
+
+* ``jsonable_encoder``: no response model, stdlib ``JSONResponse`` (the old
+  default path);
+* ``response_model``: the response models from ``server.py`` with
+  ``ORJSONResponse``, as the routes now do;
+* ``orjson_direct``: an ``ORJSONResponse`` returned by the handler, the
+  floor for shaping nothing at all.
+
+    python benchmarks/serialization.py --rows 1000 10000
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+
+from server import ChatHistoryResponse, ExpenseListResponse  # noqa: E402
+
+
+def expense_page(rows: int, rng: random.Random) -> dict:
+    return {
+        "expenses": [
+            {
+                "expense_id": f"{i:032x}",
+                "date": (datetime.date(2024, 1, 1) + datetime.timedelta(days=i % 365)).isoformat(),
+                "category": rng.choice(["Groceries", "Dining", "Rent", "Transport"]),
+                "amount": round(rng.uniform(1, 500), 2),
+                "payment_method": "Credit Card",
+                "notes": None,
+            }
+            for i in range(rows)
+        ],
+        "next_cursor": "eyJkYXRlIjoiMjAyNC0wMS0wMSJ9",
+    }
+
+
+def chat_page(rows: int, rng: random.Random) -> dict:
+    started = datetime.datetime(2024, 1, 1)
+    return {
+        "history": [
+            {
+                "chat_id": f"{i:032x}",
+                "conversation_id": "c0ffee",
+                "message": "How should I budget for groceries this month?",
+                "response": "Track what you spent last month and set aside about that much. " * 4,
+                "created_at": started + datetime.timedelta(minutes=i * rng.randint(1, 5)),
+            }
+            for i in range(rows)
+        ],
+        "next_cursor": None,
+    }
+
+
+def build_app(payload: dict, model) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/jsonable_encoder", response_class=JSONResponse)
+    async def default():
+        return payload
+
+    @app.get("/response_model", response_model=model, response_class=ORJSONResponse)
+    async def with_model():
+        return payload
+
+    @app.get("/orjson_direct")
+    async def direct():
+        return ORJSONResponse(payload)
+
+    return app
+
+
+async def time_variants(app: FastAPI, repeat: int) -> dict:
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for path in ("/jsonable_encoder", "/response_model", "/orjson_direct"):
+            response = await client.get(path)
+            response.raise_for_status()
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                await client.get(path)
+                timings.append((time.perf_counter() - started) * 1000)
+            results[path.lstrip("/")] = {
+                "median_ms": round(statistics.median(timings), 2),
+                "min_ms": round(min(timings), 2),
+                "bytes": len(response.content),
+            }
+    baseline = results["jsonable_encoder"]["median_ms"]
+    for name, result in results.items():
+        result["speedup"] = round(baseline / result["median_ms"], 1)
+    return results
+
+
+async def run(rows_list, repeat: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    report = {}
+    for rows in rows_list:
+        report[f"{rows}_rows"] = {
+            "expenses": await time_variants(build_app(expense_page(rows, rng), ExpenseListResponse), repeat),
+            "chat_history": await time_variants(build_app(chat_page(rows, rng), ChatHistoryResponse), repeat),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.rows, args.repeat, args.seed)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
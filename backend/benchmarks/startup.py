@@ -0,0 +1,117 @@
+"""Cold-start cost of a worker: importing ``server`` and running its lifespan.
+
+Each run is a fresh interpreter that times ``import server``, the lifespan
+startup (Mongo client and pool warm-up, index creation, providers) and the
+first ``/api/ready`` request, so the numbers match what an autoscaled worker
+pays before it can take traffic. The slowest imports come from
+``python -X importtime``.
+
+MongoDB is a local mongod (``--mongo-url``) or, by default, the in-memory
+``mongomock_motor`` client, in which case pool warm-up is not exercised.
+
+    python benchmarks/startup.py --runs 5
+    python benchmarks/startup.py --mongo-url mongodb://localhost:27017
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child interpreter; prints one JSON line of timings
+CHILD = r"""
+import asyncio, json, os, sys, time
+started = time.perf_counter()
+import server
+imported = time.perf_counter()
+
+async def boot():
+    import httpx
+    if os.environ.get("STARTUP_BENCHMARK_MONGOMOCK"):
+        from mongomock_motor import AsyncMongoMockClient
+        server.client = AsyncMongoMockClient()
+        server.db = server.client[server.DB_NAME]
+    lifespan_started = time.perf_counter()
+    async with server.app.router.lifespan_context(server.app):
+        lifespan_done = time.perf_counter()
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+            response = await client.get("/api/ready")
+        ready = time.perf_counter()
+    return lifespan_done - lifespan_started, ready - lifespan_done, response.status_code
+
+lifespan_s, first_request_s, status = asyncio.run(boot())
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "lifespan_ms": lifespan_s * 1000,
+    "first_ready_ms": first_request_s * 1000,
+    "total_ms": (imported - started + lifespan_s + first_request_s) * 1000,
+    "ready_status": status,
+    "heavy_modules_loaded": sorted(m for m in ("pandas", "pyarrow", "pypdf", "emergentintegrations") if m in sys.modules),
+}))
+"""
+
+
+def child_env(mongo_url):
+    env = dict(os.environ)
+    if mongo_url:
+        env["MONGO_URL"] = mongo_url
+        env.setdefault("DB_NAME", "startup_benchmark")
+    else:
+        env["STARTUP_BENCHMARK_MONGOMOCK"] = "1"
+    return env
+
+
+def run_once(mongo_url) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=BACKEND_DIR, env=child_env(mongo_url),
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(top: int) -> list:
+    """Top-level packages by cumulative import time, from -X importtime."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR, env=child_env(None), capture_output=True, text=True, check=True,
+    ).stderr
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 1 and cumulative.strip().isdigit():
+            packages[name.strip()] = int(cumulative) / 1000
+    return [{"module": name, "cumulative_ms": round(ms, 1)}
+            for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--mongo-url", default=None, help="local mongod; defaults to in-memory mongomock")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    args = parser.parse_args()
+
+    runs = [run_once(args.mongo_url) for _ in range(args.runs)]
+    report = {
+        "runs": args.runs,
+        "mongo": "mongod" if args.mongo_url else "mongomock",
+        "heavy_modules_loaded": runs[0]["heavy_modules_loaded"],
+        "ready_status": runs[-1]["ready_status"],
+    }
+    for key in ("import_ms", "lifespan_ms", "first_ready_ms", "total_ms"):
+        values = [run[key] for run in runs]
+        report[key] = {"median": round(statistics.median(values), 1), "min": round(min(values), 1)}
+    report["slowest_imports"] = slowest_imports(args.top)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
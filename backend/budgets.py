@@ -0,0 +1,85 @@
+"""Monthly per-category budgets and threshold alerts.
+
+Limits live on the user's ``user_setups`` document as a list of
+``{"category", "limit_cents"}`` entries (category names are user input and
+cannot safely be used as field names). Spending is never re-summed: the
+rollup update in ``rollups.apply_expenses`` returns the category's new month
+total, and the total before the write is that minus the delta, so detecting a
+crossing costs one document update per budgeted category written to.
+
+Crossings are recorded in ``budget_alerts``, unique per (user_id, month,
+category, threshold), so concurrent writes crossing the same line alert once.
+"""
+import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+# Percent of the limit at which an alert is recorded
+THRESHOLDS = (80, 100)
+
+
+def limits_from_setup(setup: Optional[dict]) -> Dict[str, int]:
+    # Zero limits could be saved before limits had to be at least a cent
+    return {
+        budget["category"]: budget["limit_cents"]
+        for budget in (setup or {}).get("budgets", []) if budget["limit_cents"] > 0
+    }
+
+
+async def get_limits(db, user_id: str) -> Dict[str, int]:
+    """Category -> monthly limit in cents."""
+    setup = await db.user_setups.find_one({"user_id": user_id}, {"_id": 0, "budgets": 1})
+    return limits_from_setup(setup)
+
+
+def crossed_thresholds(before: int, after: int, limit_cents: int) -> List[int]:
+    """Thresholds that ``after`` reaches but ``before`` did not."""
+    return [
+        threshold for threshold in THRESHOLDS
+        if before * 100 < threshold * limit_cents <= after * 100
+    ]
+
+
+async def record_crossings(db, user_id: str, month: str, changes: Iterable[Tuple[str, int, int]],
+                           limits: Dict[str, int]) -> int:
+    """Record alerts for (category, before_cents, after_cents) changes; returns how many are new."""
+    recorded = 0
+    now = datetime.datetime.utcnow()
+    for category, before, after in changes:
+        limit_cents = limits.get(category)
+        if not limit_cents:
+            continue
+        for threshold in crossed_thresholds(before, after, limit_cents):
+            try:
+                await db.budget_alerts.insert_one({
+                    "user_id": user_id,
+                    "month": month,
+                    "category": category,
+                    "threshold": threshold,
+                    "spent_cents": after,
+                    "limit_cents": limit_cents,
+                    "created_at": now,
+                })
+            except DuplicateKeyError:
+                continue
+            recorded += 1
+    return recorded
+
+
+async def reset_month_alerts(db, user_id: str, month: str, limits: Dict[str, int]) -> None:
+    """Re-evaluate ``month`` after the limits changed.
+
+    Alerts of the month are dropped and recorded again against the new
+    limits from the current rollup totals.
+    """
+    await db.budget_alerts.delete_many({"user_id": user_id, "month": month})
+    rollups = await db.expense_rollups.find(
+        {"user_id": user_id, "month": month, "category": {"$in": list(limits)}},
+        {"_id": 0, "category": 1, "total_cents": 1},
+    ).to_list(None)
+    await record_crossings(
+        db, user_id, month,
+        [(rollup["category"], 0, rollup.get("total_cents", 0)) for rollup in rollups],
+        limits,
+    )
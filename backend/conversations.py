@@ -0,0 +1,200 @@
+"""Advisor chat conversations and their token-budgeted prompt context.
+
+Every turn in ``db.chat_history`` belongs to a document in
+``db.conversations``. The prompt for a new message is the conversation's
+rolling summary plus as many of the most recent turns as fit in the token
+budget. Turns that no longer fit are folded into the summary after the reply
+has been sent, so prompt size stays bounded however long the conversation
+grows.
+"""
+import datetime
+import logging
+import uuid
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from pymongo import ASCENDING, DESCENDING
+
+from retention import expires_at
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_SYSTEM_MESSAGE = (
+    "You maintain a running summary of a conversation between a user and their "
+    "financial advisor. Keep the facts, goals and figures the user shared and the "
+    "advice already given. Reply with the updated summary only."
+)
+
+# Upper bound on turns read when assembling context; the budget normally
+# stops well before this. A full read may leave older turns unread, so it
+# counts as overflow as well.
+MAX_CONTEXT_TURNS = 50
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+def format_turn(turn: dict) -> str:
+    return f"User: {turn['message']}\nAdvisor: {turn['response']}"
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    limit = tokens * 4
+    return text[:limit]
+
+
+async def get_or_create_conversation(db, user_id: str, conversation_id: Optional[str], title: str) -> dict:
+    if conversation_id:
+        conversation = await db.conversations.find_one(
+            {"conversation_id": conversation_id, "user_id": user_id}, {"_id": 0}
+        )
+        if conversation is None:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        return conversation
+
+    now = datetime.datetime.utcnow()
+    conversation = {
+        "conversation_id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "title": title[:80],
+        "summary": "",
+        # created_at of the newest turn already folded into the summary
+        "summarized_until": None,
+        "turn_count": 0,
+        "created_at": now,
+        "updated_at": now,
+    }
+    await db.conversations.insert_one(dict(conversation))
+    return conversation
+
+
+async def unsummarized_turns(db, conversation: dict, limit: int = MAX_CONTEXT_TURNS) -> List[dict]:
+    """Newest-first turns that are not yet part of the summary."""
+    query = {"conversation_id": conversation["conversation_id"]}
+    if conversation.get("summarized_until"):
+        query["created_at"] = {"$gt": conversation["summarized_until"]}
+    return await db.chat_history.find(
+        query, {"_id": 0, "message": 1, "response": 1, "created_at": 1}
+    ).sort([("created_at", DESCENDING), ("chat_id", DESCENDING)]).limit(limit).to_list(limit)
+
+
+def fit_turns(turns: List[dict], budget: int,
+              max_turns: Optional[int] = None) -> Tuple[List[dict], List[dict]]:
+    """Split newest-first ``turns`` into (kept oldest-first, overflow oldest-first)."""
+    kept = []
+    used = 0
+    for turn in turns:
+        cost = estimate_tokens(format_turn(turn))
+        if used + cost > budget or len(kept) == max_turns:
+            break
+        kept.append(turn)
+        used += cost
+    overflow = turns[len(kept):]
+    return kept[::-1], overflow[::-1]
+
+
+async def build_prompt(db, conversation: dict, message: str, budget: int, summary_tokens: int) -> Tuple[str, bool]:
+    """Prompt text for ``message`` and whether older turns need summarizing."""
+    summary = truncate_to_tokens(conversation.get("summary") or "", summary_tokens)
+    remaining = budget - estimate_tokens(summary) - estimate_tokens(message)
+    turns = await unsummarized_turns(db, conversation)
+    kept, overflow = fit_turns(turns, max(remaining, 0))
+
+    sections = []
+    if summary:
+        sections.append(f"Summary of the earlier conversation:\n{summary}")
+    if kept:
+        sections.append("Recent conversation:\n" + "\n\n".join(format_turn(turn) for turn in kept))
+    sections.append(f"User: {message}" if sections else message)
+    return "\n\n".join(sections), bool(overflow) or len(turns) == MAX_CONTEXT_TURNS
+
+
+async def record_turn(db, conversation_id: str, user_id: str, message: str, response: str) -> str:
+    now = datetime.datetime.utcnow()
+    chat_id = str(uuid.uuid4())
+    await db.chat_history.insert_one({
+        "chat_id": chat_id,
+        "conversation_id": conversation_id,
+        "user_id": user_id,
+        "message": message,
+        "response": response,
+        "created_at": now,
+        "expires_at": expires_at("chat_history", now),
+    })
+    await db.conversations.update_one(
+        {"conversation_id": conversation_id},
+        {"$set": {"updated_at": now}, "$inc": {"turn_count": 1}}
+    )
+    return chat_id
+
+
+async def summarize_overflow(db, llm, conversation_id: str, budget: int, summary_tokens: int) -> None:
+    """Fold every turn older than the ones that fit in the context budget into the summary.
+
+    Runs after the reply has been delivered; a failure only means the next
+    prompt carries fewer recent turns. A long backlog is folded in chunks of
+    at most ``budget`` tokens, oldest first.
+    """
+    try:
+        conversation = await db.conversations.find_one({"conversation_id": conversation_id}, {"_id": 0})
+        if conversation is None:
+            return
+        turns = await unsummarized_turns(db, conversation)
+        # Leave room for the next message as well as the summary itself, and
+        # keep at most half the turn cap so the next fold is some turns away
+        kept, overflow = fit_turns(
+            turns, max(budget - summary_tokens * 2, 0), max_turns=MAX_CONTEXT_TURNS // 2
+        )
+        if not overflow:
+            return
+
+        # Turns past the MAX_CONTEXT_TURNS read are older still, so fetch
+        # everything unsummarized before the oldest kept turn
+        query = {"conversation_id": conversation_id, "created_at": {"$lte": overflow[-1]["created_at"]}}
+        if conversation.get("summarized_until"):
+            query["created_at"]["$gt"] = conversation["summarized_until"]
+        older = db.chat_history.find(
+            query, {"_id": 0, "message": 1, "response": 1, "created_at": 1}
+        ).sort([("created_at", ASCENDING), ("chat_id", ASCENDING)])
+
+        chunk: List[dict] = []
+        used = 0
+        async for turn in older:
+            cost = estimate_tokens(format_turn(turn))
+            if chunk and used + cost > budget:
+                conversation = await _fold(db, llm, conversation, chunk, summary_tokens)
+                if conversation is None:
+                    return
+                chunk, used = [], 0
+            chunk.append(turn)
+            used += cost
+        if chunk:
+            await _fold(db, llm, conversation, chunk, summary_tokens)
+    except Exception:
+        logger.exception("Could not summarize conversation %s", conversation_id)
+
+
+async def _fold(db, llm, conversation: dict, turns: List[dict], summary_tokens: int) -> Optional[dict]:
+    """Fold oldest-first ``turns`` into the summary; the updated conversation, or
+    ``None`` if a concurrent summarization moved on first."""
+    conversation_id = conversation["conversation_id"]
+    text = (
+        f"Current summary:\n{conversation.get('summary') or '(none)'}\n\n"
+        "New turns to fold in:\n" + "\n\n".join(format_turn(turn) for turn in turns) +
+        f"\n\nWrite the updated summary in at most {summary_tokens * 3 // 4} words."
+    )
+    updated = await llm.send(f"summary_{conversation_id}", SUMMARY_SYSTEM_MESSAGE, text)
+    changes = {
+        "summary": truncate_to_tokens(updated.strip(), summary_tokens),
+        "summarized_until": turns[-1]["created_at"],
+    }
+    result = await db.conversations.update_one(
+        # Guard against a concurrent summarization having moved on already
+        {"conversation_id": conversation_id, "summarized_until": conversation.get("summarized_until")},
+        {"$set": changes}
+    )
+    if not result.matched_count:
+        return None
+    return {**conversation, **changes}
@@ -0,0 +1,131 @@
+"""Stored representation of an expense.
+
+Expenses are persisted with typed fields so that MongoDB can range-scan and
+aggregate them directly:
+
+* ``date``: BSON date at midnight UTC of the expense day;
+* ``month``: "YYYY-MM" bucket precomputed from ``date``;
+* ``amount_cents``: integer minor units, so sums never drift.
+
+The API keeps speaking "YYYY-MM-DD" strings and decimal amounts; ``to_api``
+converts a stored document back. Documents written before the migration
+(string ``date``, float ``amount``) are still understood by every helper here
+until ``python manage.py migrate-expenses`` has rewritten them.
+"""
+import datetime
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Any, Optional, Union
+
+CENT = Decimal("0.01")
+# Largest amount a BSON int64 holds
+MAX_CENTS = 2 ** 63 - 1
+
+# Read by every query that needs the amount, in either representation
+AMOUNT_FIELDS = ["amount_cents", "amount"]
+
+DateLike = Union[str, datetime.date, datetime.datetime]
+
+
+def to_cents(amount: Union[float, int, str, Decimal]) -> int:
+    """Decimal amount to integer cents, rounding half away from zero.
+
+    Raises ``ValueError`` for NaN, infinities and amounts too large to store.
+    """
+    try:
+        cents = int(Decimal(str(amount)).quantize(CENT, rounding=ROUND_HALF_UP) * 100)
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {amount!r}")
+    if abs(cents) > MAX_CENTS:
+        raise ValueError(f"Amount out of range: {amount!r}")
+    return cents
+
+
+def from_cents(cents: int) -> float:
+    return cents / 100
+
+
+def to_storage_date(value: DateLike) -> datetime.datetime:
+    """Midnight UTC (naive, as BSON dates are read back) of the given day.
+
+    Raises ``ValueError`` for strings that are not "YYYY-MM-DD" dates and
+    ``TypeError`` for values that are not strings or dates at all.
+    """
+    if isinstance(value, datetime.datetime):
+        return datetime.datetime(value.year, value.month, value.day)
+    if isinstance(value, datetime.date):
+        return datetime.datetime(value.year, value.month, value.day)
+    if not isinstance(value, str):
+        raise TypeError(f"Not a date: {value!r}")
+    return datetime.datetime.strptime(value.strip()[:10], "%Y-%m-%d")
+
+
+def date_string(value: DateLike) -> str:
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.strftime("%Y-%m-%d")
+    return value[:10]
+
+
+def month_bucket(value: DateLike) -> str:
+    return date_string(value)[:7]
+
+
+def typed_fields(date: DateLike, amount: Union[float, int, str, Decimal]) -> dict:
+    stored_date = to_storage_date(date)
+    return {
+        "date": stored_date,
+        "month": month_bucket(stored_date),
+        "amount_cents": to_cents(amount),
+    }
+
+
+def cents_of(expense: dict) -> int:
+    if "amount_cents" in expense:
+        return expense["amount_cents"]
+    return to_cents(expense["amount"])
+
+
+def amount_of(expense: dict) -> float:
+    if "amount_cents" in expense:
+        return from_cents(expense["amount_cents"])
+    return expense["amount"]
+
+
+def month_of(expense: dict) -> str:
+    return expense.get("month") or month_bucket(expense["date"])
+
+
+def to_api(expense: dict) -> dict:
+    """API shape of a stored expense: "YYYY-MM-DD" date and decimal amount."""
+    document = {key: value for key, value in expense.items() if key not in ("month", "amount_cents")}
+    if "date" in expense:
+        document["date"] = date_string(expense["date"])
+    if "amount_cents" in expense or "amount" in expense:
+        document["amount"] = amount_of(expense)
+    return document
+
+
+def date_range(start: Optional[DateLike], end: Optional[DateLike]) -> dict:
+    """``$gte``/``$lte`` filter on ``date`` for inclusive day bounds."""
+    bounds: dict = {}
+    if start:
+        bounds["$gte"] = to_storage_date(start)
+    if end:
+        bounds["$lte"] = to_storage_date(end)
+    return bounds
+
+
+def migration_update(expense: dict) -> Optional[dict]:
+    """Update that rewrites a legacy document into typed fields.
+
+    Returns ``None`` when the document is already typed; raises ``ValueError``
+    when its date or amount cannot be interpreted.
+    """
+    if isinstance(expense.get("date"), datetime.datetime) and "amount_cents" in expense and "month" in expense:
+        return None
+    amount: Any = expense["amount_cents"] / 100 if "amount_cents" in expense else expense.get("amount")
+    if amount is None:
+        raise ValueError("missing amount")
+    update: dict = {"$set": typed_fields(expense["date"], amount)}
+    if "amount" in expense:
+        update["$unset"] = {"amount": ""}
+    return update
@@ -0,0 +1,124 @@
+"""Streaming expense exports.
+
+Each exporter consumes a Motor cursor in batches and yields encoded chunks, so
+memory stays flat regardless of how many expenses a user has and the first
+bytes go out as soon as the first batch arrives.
+"""
+import csv
+import io
+import json
+import zlib
+from typing import AsyncIterator, Dict, List
+
+from expense_schema import to_api
+
+EXPORT_FIELDS = ["date", "category", "amount", "payment_method", "notes"]
+CSV_HEADER = ["Date", "Category", "Amount", "Payment Method", "Notes"]
+
+EXPORT_FORMATS: Dict[str, Dict[str, str]] = {
+    "csv": {"media_type": "text/csv; charset=utf-8", "extension": "csv"},
+    "ndjson": {"media_type": "application/x-ndjson", "extension": "ndjson"},
+    "parquet": {"media_type": "application/vnd.apache.parquet", "extension": "parquet"},
+}
+
+
+async def iter_batches(cursor, batch_size: int) -> AsyncIterator[List[dict]]:
+    """Batches of expenses in their API shape ("YYYY-MM-DD" date, decimal amount)."""
+    while True:
+        batch = await cursor.to_list(batch_size)
+        if not batch:
+            return
+        yield [to_api(expense) for expense in batch]
+
+
+async def iter_csv(cursor, batch_size: int) -> AsyncIterator[bytes]:
+    """RFC 4180 CSV: CRLF line endings, fields quoted when needed."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\r\n")
+    writer.writerow(CSV_HEADER)
+    yield buffer.getvalue().encode()
+
+    async for batch in iter_batches(cursor, batch_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(
+            [expense.get(field) if expense.get(field) is not None else "" for field in EXPORT_FIELDS]
+            for expense in batch
+        )
+        yield buffer.getvalue().encode()
+
+
+async def iter_ndjson(cursor, batch_size: int) -> AsyncIterator[bytes]:
+    async for batch in iter_batches(cursor, batch_size):
+        yield "".join(
+            json.dumps({field: expense.get(field) for field in EXPORT_FIELDS}, default=str) + "\n"
+            for expense in batch
+        ).encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+async def iter_parquet(cursor, batch_size: int) -> AsyncIterator[bytes]:
+    """Parquet file with one row group per cursor batch."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("date", pa.string()),
+        ("category", pa.string()),
+        ("amount", pa.float64()),
+        ("payment_method", pa.string()),
+        ("notes", pa.string()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        async for batch in iter_batches(cursor, batch_size):
+            columns = {field: [expense.get(field) for expense in batch] for field in EXPORT_FIELDS}
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+EXPORTERS = {"csv": iter_csv, "ndjson": iter_ndjson, "parquet": iter_parquet}
@@ -0,0 +1,172 @@
+"""Declared MongoDB indexes for the financial SaaS backend.
+
+Every query issued on a hot path in ``server.py`` should be covered by one of
+the indexes below. ``HOT_QUERIES`` lists the query shapes the routes issue so
+that ``tests/test_query_plans.py`` can ``explain()`` them and fail on a
+collection scan whenever a route and its index drift apart.
+"""
+import datetime
+import logging
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from pagination import descending_after
+
+logger = logging.getLogger(__name__)
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+    "user_setups": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+        # Users whose setup changed since the last recommendation precompute
+        IndexModel([("updated_at", ASCENDING), ("user_id", ASCENDING)], name="updated_user"),
+    ],
+    "expenses": [
+        IndexModel([("expense_id", ASCENDING)], name="expense_id_unique", unique=True),
+        # Keyset pagination sorts on (date, expense_id); the category and
+        # payment_method variants serve the equality filters of GET /api/expenses.
+        IndexModel(
+            [("user_id", ASCENDING), ("date", DESCENDING), ("expense_id", DESCENDING)],
+            name="user_date_expense",
+        ),
+        IndexModel(
+            [("user_id", ASCENDING), ("category", ASCENDING),
+             ("date", DESCENDING), ("expense_id", DESCENDING)],
+            name="user_category_date_expense",
+        ),
+        IndexModel(
+            [("user_id", ASCENDING), ("payment_method", ASCENDING),
+             ("date", DESCENDING), ("expense_id", DESCENDING)],
+            name="user_payment_method_date_expense",
+        ),
+    ],
+    "expense_rollups": [
+        IndexModel(
+            [("user_id", ASCENDING), ("month", ASCENDING), ("category", ASCENDING)],
+            name="user_month_category_unique",
+            unique=True,
+        ),
+        # Users whose spending changed since the last recommendation precompute
+        IndexModel([("updated_at", ASCENDING), ("user_id", ASCENDING)], name="updated_user"),
+    ],
+    "budget_alerts": [
+        # One alert per threshold crossing; also serves the dashboard's month lookup
+        IndexModel(
+            [("user_id", ASCENDING), ("month", ASCENDING), ("category", ASCENDING), ("threshold", ASCENDING)],
+            name="user_month_category_threshold_unique",
+            unique=True,
+        ),
+    ],
+    "statement_jobs": [
+        IndexModel([("job_id", ASCENDING)], name="job_id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created"),
+        IndexModel([("status", ASCENDING), ("updated_at", ASCENDING)], name="status_updated"),
+    ],
+    "payment_transactions": [
+        IndexModel([("session_id", ASCENDING)], name="session_id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created"),
+    ],
+    "stripe_events": [
+        IndexModel([("event_id", ASCENDING)], name="event_id_unique", unique=True),
+        IndexModel([("processed", ASCENDING), ("received_at", ASCENDING)], name="processed_received"),
+    ],
+    "conversations": [
+        IndexModel([("conversation_id", ASCENDING)], name="conversation_id_unique", unique=True),
+        IndexModel(
+            [("user_id", ASCENDING), ("updated_at", DESCENDING), ("conversation_id", DESCENDING)],
+            name="user_updated_conversation",
+        ),
+    ],
+    "chat_history": [
+        # Keyset pagination of history sorts on (created_at, chat_id)
+        IndexModel(
+            [("user_id", ASCENDING), ("created_at", DESCENDING), ("chat_id", DESCENDING)],
+            name="user_created_chat",
+        ),
+        IndexModel(
+            [("conversation_id", ASCENDING), ("created_at", DESCENDING), ("chat_id", DESCENDING)],
+            name="conversation_created_chat",
+        ),
+        # TTL backstop behind the archival job (retention.py)
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "recommendations": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created"),
+        IndexModel(
+            [("user_id", ASCENDING), ("fingerprint", ASCENDING), ("created_at", DESCENDING)],
+            name="user_fingerprint_created",
+        ),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+# (route, collection, filter, sort) for every query the routes issue.
+# Values are placeholders; only the shape matters to the query planner.
+HOT_QUERIES = [
+    ("signup/login", "users", {"email": "user@example.com"}, None),
+    ("get_current_user", "users", {"user_id": "u"}, None),
+    ("setup", "user_setups", {"user_id": "u"}, None),
+    ("expenses", "expenses", {"user_id": "u"}, None),
+    ("list_expenses", "expenses",
+     {"user_id": "u", "date": {"$gte": datetime.datetime(2024, 1, 1), "$lte": datetime.datetime(2024, 12, 31)}},
+     [("date", DESCENDING), ("expense_id", DESCENDING)]),
+    # Page N > 1: the cursor's keyset condition, as built by GET /api/expenses
+    ("list_expenses", "expenses",
+     {"$and": [{"user_id": "u"},
+               descending_after(["date", "expense_id"], [datetime.datetime(2024, 6, 1), "e"])]},
+     [("date", DESCENDING), ("expense_id", DESCENDING)]),
+    ("list_expenses", "expenses", {"user_id": "u", "category": "Food"},
+     [("date", DESCENDING), ("expense_id", DESCENDING)]),
+    ("list_expenses", "expenses", {"user_id": "u", "payment_method": "Cash"},
+     [("date", DESCENDING), ("expense_id", DESCENDING)]),
+    ("upload_status", "statement_jobs", {"job_id": "j", "user_id": "u"}, None),
+    ("startup", "statement_jobs",
+     {"status": {"$in": ["queued", "parsing", "inserting"]}, "updated_at": {"$lt": datetime.datetime(2024, 1, 1)}}, None),
+    ("payment_status", "payment_transactions", {"session_id": "s"}, None),
+    ("stripe_webhook", "payment_transactions", {"session_id": "s", "payment_status": {"$ne": "paid"}}, None),
+    ("stripe_webhook", "stripe_events", {"event_id": "e"}, None),
+    ("startup", "stripe_events", {"processed": False}, [("received_at", ASCENDING)]),
+    ("chat_history", "chat_history", {"user_id": "u"}, [("created_at", DESCENDING), ("chat_id", DESCENDING)]),
+    ("chat_history", "chat_history", {"user_id": "u", "conversation_id": "c"},
+     [("created_at", DESCENDING), ("chat_id", DESCENDING)]),
+    ("chat", "chat_history",
+     {"conversation_id": "c", "created_at": {"$gt": datetime.datetime(2024, 1, 1)}},
+     [("created_at", DESCENDING), ("chat_id", DESCENDING)]),
+    ("chat", "conversations", {"conversation_id": "c", "user_id": "u"}, None),
+    ("conversations", "conversations", {"user_id": "u"},
+     [("updated_at", DESCENDING), ("conversation_id", DESCENDING)]),
+    ("dashboard", "expense_rollups", {"user_id": "u", "month": "2024-01"}, None),
+    ("create_expense", "expense_rollups", {"user_id": "u", "month": "2024-01", "category": "Food"}, None),
+    ("budgets", "expense_rollups", {"user_id": "u", "month": "2024-01", "category": {"$in": ["Food"]}}, None),
+    ("dashboard", "budget_alerts", {"user_id": "u", "month": "2024-01"},
+     [("category", ASCENDING), ("threshold", ASCENDING)]),
+    ("recommendations", "recommendations",
+     {"user_id": "u", "fingerprint": "f", "created_at": {"$gte": datetime.datetime(2024, 1, 1)}},
+     [("created_at", DESCENDING)]),
+    ("dashboard", "recommendations", {"user_id": "u"}, [("created_at", DESCENDING)]),
+    ("archive", "chat_history", {"expires_at": None}, None),
+    ("archive", "chat_history",
+     {"expires_at": {"$lte": datetime.datetime(2024, 1, 1)}, "restored_at": None, "user_id": "u"},
+     [("expires_at", ASCENDING)]),
+    ("archive", "recommendations",
+     {"expires_at": {"$lte": datetime.datetime(2024, 1, 1)}, "restored_at": None, "user_id": "u"},
+     [("expires_at", ASCENDING)]),
+    ("precompute", "expense_rollups", {"updated_at": {"$gt": datetime.datetime(2024, 1, 1)}}, None),
+    ("precompute", "user_setups", {"updated_at": {"$gt": datetime.datetime(2024, 1, 1)}}, None),
+]
+
+
+async def ensure_indexes(db) -> None:
+    """Create every declared index. Safe to call on each startup."""
+    for collection, models in INDEXES.items():
+        try:
+            await db[collection].create_indexes(models)
+        except OperationFailure as e:
+            # Most likely duplicate data blocking a unique index; keep serving
+            # and let the operator clean up rather than refusing to boot.
+            logger.error("Could not create indexes on %s: %s", collection, e)
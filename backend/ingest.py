@@ -0,0 +1,89 @@
+"""Batched expense ingestion shared by the bulk API and statement imports."""
+import datetime
+import uuid
+from typing import Any, Dict, List
+
+from pymongo.errors import BulkWriteError
+
+from expense_schema import typed_fields
+from rollups import apply_expenses
+
+
+def new_expense_document(user_id: str, fields: Dict[str, Any], **extra) -> dict:
+    """Build the stored form of an expense from validated ``ExpenseCreate`` fields."""
+    return {
+        "expense_id": str(uuid.uuid4()),
+        "user_id": user_id,
+        **typed_fields(fields["date"], fields["amount"]),
+        "category": fields["category"],
+        "payment_method": fields["payment_method"],
+        "notes": fields.get("notes"),
+        "created_at": datetime.datetime.utcnow(),
+        **extra,
+    }
+
+
+class ExpenseBatchWriter:
+    """Accumulates expenses and writes them with unordered ``insert_many``.
+
+    Rows are identified by the caller's ``row`` number so that per-row
+    outcomes can be reported back; a failed row never blocks the rest of its
+    batch. Rollups are updated once per batch for the rows that landed.
+    """
+
+    def __init__(self, db, user_id: str, batch_size: int, keep_results: bool = True, **extra):
+        self.db = db
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.keep_results = keep_results
+        self.extra = extra
+        self.inserted = 0
+        self.failed = 0
+        self.results: List[dict] = []
+        self._pending: List[tuple] = []
+
+    async def add(self, row: int, fields: Dict[str, Any]) -> None:
+        try:
+            document = new_expense_document(self.user_id, fields, **self.extra)
+        except ValueError as e:
+            # e.g. an amount beyond what can be stored
+            self.reject(row, str(e))
+            return
+        self._pending.append((row, document))
+        if len(self._pending) >= self.batch_size:
+            await self.flush()
+
+    def reject(self, row: int, error: str) -> None:
+        self.failed += 1
+        if self.keep_results:
+            self.results.append({"row": row, "status": "error", "error": error})
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        documents = [document for _, document in pending]
+
+        errors: Dict[int, str] = {}
+        try:
+            await self.db.expenses.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                errors[error["index"]] = error.get("errmsg", "Write failed")
+
+        landed = []
+        for index, (row, document) in enumerate(pending):
+            if index in errors:
+                self.reject(row, errors[index])
+            else:
+                landed.append(document)
+                self.inserted += 1
+                if self.keep_results:
+                    self.results.append({"row": row, "status": "ok", "expense_id": document["expense_id"]})
+        await apply_expenses(self.db, landed)
+
+    def summary(self) -> dict:
+        summary: Dict[str, Any] = {"inserted": self.inserted, "failed": self.failed}
+        if self.keep_results:
+            summary["results"] = sorted(self.results, key=lambda result: result["row"])
+        return summary
@@ -0,0 +1,70 @@
+"""Request-scoped document loader.
+
+Handlers that need several documents fetch them concurrently with
+``asyncio.gather`` and go through a ``RequestLoader`` for keyed lookups:
+
+* repeated lookups of the same document within one request share one read;
+* lookups against the same collection and key field issued in the same event
+  loop tick are sent as a single ``{field: {"$in": [...]}}`` query.
+"""
+import asyncio
+from collections import defaultdict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class RequestLoader:
+    def __init__(self, db):
+        self.db = db
+        self.queries = 0
+        self._futures: Dict[Tuple[str, str, Hashable], asyncio.Future] = {}
+        self._pending: Dict[Tuple[str, str], Dict[Hashable, asyncio.Future]] = defaultdict(dict)
+
+    def load(self, collection: str, field: str, value: Hashable) -> "asyncio.Future[Optional[dict]]":
+        """Future for the document in ``collection`` whose ``field`` equals ``value``."""
+        key = (collection, field, value)
+        future = self._futures.get(key)
+        if future is not None:
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._futures[key] = future
+
+        batch = self._pending[(collection, field)]
+        if not batch:
+            loop.call_soon(lambda: asyncio.ensure_future(self._dispatch(collection, field)))
+        batch[value] = future
+        return future
+
+    def prime(self, collection: str, field: str, value: Hashable, document: Any) -> None:
+        """Record a document the request already has so later loads reuse it."""
+        key = (collection, field, value)
+        if key not in self._futures:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(document)
+            self._futures[key] = future
+
+    async def _dispatch(self, collection: str, field: str) -> None:
+        batch = self._pending.pop((collection, field), {})
+        if not batch:
+            return
+        self.queries += 1
+        try:
+            if len(batch) == 1:
+                (value,) = batch
+                document = await self.db[collection].find_one({field: value})
+                documents = [document] if document else []
+            else:
+                documents = await self.db[collection].find(
+                    {field: {"$in": list(batch)}}
+                ).to_list(len(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        by_value = {document[field]: document for document in documents}
+        for value, future in batch.items():
+            if not future.done():
+                future.set_result(by_value.get(value))
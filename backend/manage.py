@@ -0,0 +1,190 @@
+"""Operational commands for the financial SaaS backend.
+
+Run from the backend directory, e.g. ``python manage.py rebuild-rollups``.
+"""
+import asyncio
+import os
+from typing import Optional
+
+import typer
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+from expense_schema import migration_update
+from indexes import ensure_indexes
+from precompute import RecommendationScheduler
+from providers import Providers
+from recommendations import RecommendationCache, generate_recommendation
+from retention import ARCHIVE_DIR, RETENTION_DAYS, archive_expired, restore_archive
+from rollups import rebuild_rollups
+
+load_dotenv()
+
+cli = typer.Typer(help="Financial SaaS maintenance commands")
+
+
+def get_db():
+    client = AsyncIOMotorClient(os.environ.get('MONGO_URL'))
+    return client[os.environ.get('DB_NAME', 'financial_saas')]
+
+
+@cli.command("rebuild-rollups")
+def rebuild_rollups_command(
+    user_id: Optional[str] = typer.Option(None, help="Only rebuild this user's rollups"),
+):
+    """Recompute expense_rollups from db.expenses (backfill / drift repair)."""
+    async def run():
+        db = get_db()
+        await ensure_indexes(db)
+        return await rebuild_rollups(db, user_id)
+
+    count = asyncio.run(run())
+    typer.echo(f"Rebuilt {count} rollup documents")
+
+
+# Checkpoint document in db.migrations for migrate-expenses
+EXPENSES_MIGRATION_ID = "expenses_typed_storage"
+
+
+async def migrate_expenses(db, batch_size: int, restart: bool) -> dict:
+    """Rewrite legacy expenses (string date, float amount) into typed fields.
+
+    Scans in ``_id`` order and checkpoints after every batch, so an interrupted
+    run resumes where it stopped. Each update is conditional on the date it
+    read, leaving a concurrently edited document for the next run.
+    """
+    if restart:
+        await db.migrations.delete_one({"_id": EXPENSES_MIGRATION_ID})
+    state = await db.migrations.find_one({"_id": EXPENSES_MIGRATION_ID}) or {}
+    last_id = state.get("last_id")
+    migrated, failed = state.get("migrated", 0), state.get("failed", 0)
+
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = await db.expenses.find(
+            query, {"_id": 1, "date": 1, "amount": 1, "amount_cents": 1, "month": 1}
+        ).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+
+        operations = []
+        for expense in batch:
+            try:
+                update = migration_update(expense)
+            except (KeyError, TypeError, ValueError, ArithmeticError):
+                failed += 1
+                continue
+            if update is not None:
+                operations.append(UpdateOne({"_id": expense["_id"], "date": expense["date"]}, update))
+        if operations:
+            result = await db.expenses.bulk_write(operations, ordered=False)
+            migrated += result.modified_count
+
+        last_id = batch[-1]["_id"]
+        await db.migrations.update_one(
+            {"_id": EXPENSES_MIGRATION_ID},
+            {"$set": {"last_id": last_id, "migrated": migrated, "failed": failed}},
+            upsert=True,
+        )
+
+    # Rollups built from float amounts are replaced with cent totals
+    rollups = await rebuild_rollups(db)
+    return {"migrated": migrated, "failed": failed, "rollups": rollups}
+
+
+@cli.command("migrate-expenses")
+def migrate_expenses_command(
+    batch_size: int = typer.Option(1000, min=1, help="Expenses rewritten per bulk write"),
+    restart: bool = typer.Option(False, help="Ignore the checkpoint and scan from the start"),
+):
+    """Convert expenses to BSON dates and integer cents (resumable)."""
+    async def run():
+        db = get_db()
+        await ensure_indexes(db)
+        return await migrate_expenses(db, batch_size, restart)
+
+    result = asyncio.run(run())
+    typer.echo(
+        f"Migrated {result['migrated']} expenses, {result['failed']} could not be converted; "
+        f"rebuilt {result['rollups']} rollup documents"
+    )
+
+
+@cli.command("precompute-recommendations")
+def precompute_recommendations_command(
+    max_per_run: int = typer.Option(
+        int(os.environ.get('RECOMMENDATION_PRECOMPUTE_MAX_PER_RUN', 100)), min=0, help="LLM calls allowed"
+    ),
+    concurrency: int = typer.Option(
+        int(os.environ.get('RECOMMENDATION_PRECOMPUTE_CONCURRENCY', 2)), min=1, help="LLM calls in flight"
+    ),
+):
+    """Regenerate recommendations of users whose finances changed (one scheduler run)."""
+    async def run():
+        db = get_db()
+        await ensure_indexes(db)
+        providers = Providers.from_env()
+        cache = RecommendationCache(ttl=float(os.environ.get('RECOMMENDATION_TTL_SECONDS', 24 * 60 * 60)))
+        scheduler = RecommendationScheduler(cache, interval=0, concurrency=concurrency, max_per_run=max_per_run)
+
+        async def generate(user_id, inputs, inputs_fingerprint):
+            return await generate_recommendation(db, providers.llm, user_id, inputs, inputs_fingerprint)
+
+        try:
+            return await scheduler.run_once(db, generate)
+        finally:
+            await providers.aclose()
+
+    result = asyncio.run(run())
+    if result["status"] == "locked":
+        typer.echo("Another worker is precomputing recommendations; try again later")
+        raise typer.Exit(1)
+    typer.echo(
+        f"{result['status'].capitalize()}: {result['generated']} generated, {result['fresh']} already fresh, "
+        f"{result['failed']} failed, of {result['candidates']} changed users"
+    )
+
+
+@cli.command("archive-expired")
+def archive_expired_command(
+    archive_dir: str = typer.Option(ARCHIVE_DIR, help="Root directory of the gzip NDJSON archive"),
+    batch_size: int = typer.Option(1000, min=1),
+):
+    """Move chat turns and recommendations past their retention to the archive."""
+    async def run():
+        db = get_db()
+        await ensure_indexes(db)
+        return {
+            collection: await archive_expired(db, collection, archive_dir, batch_size)
+            for collection, days in RETENTION_DAYS.items() if days
+        }
+
+    for collection, result in asyncio.run(run()).items():
+        typer.echo(
+            f"{collection}: archived {result['archived']} documents of {result['users']} users "
+            f"({result['backfilled']} older documents given an expiry)"
+        )
+
+
+@cli.command("restore-archive")
+def restore_archive_command(
+    path: str = typer.Argument(..., help="An archive file, or a directory to restore recursively"),
+    keep_days: int = typer.Option(30, min=1, help="Days before restored documents expire again"),
+    collection: Optional[str] = typer.Option(None, help="Target collection; defaults to the archived one"),
+):
+    """Load archived documents back into MongoDB."""
+    async def run():
+        db = get_db()
+        await ensure_indexes(db)
+        return await restore_archive(db, path, keep_days, collection)
+
+    result = asyncio.run(run())
+    typer.echo(
+        f"Restored {result['restored']} documents from {result['files']} files "
+        f"({result['skipped']} already present)"
+    )
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,155 @@
+"""Prometheus metrics for the API, MongoDB and the upstream services.
+
+Everything is recorded in-process on a dedicated registry and exposed in the
+Prometheus text format by ``GET /api/metrics``, so a slow page can be broken
+down into route, database and upstream time without an external agent:
+
+* ``MetricsMiddleware`` times every request by route template and status;
+* ``MongoCommandListener`` times every command by collection and command name;
+* ``UpstreamPool`` (providers.py) times every LLM and Stripe call;
+* ``StatsCollector`` re-exports the ``stats()`` of the in-process caches,
+  pools and queues reported by ``/api/health`` as gauges.
+"""
+import threading
+import time
+from typing import Callable, Dict, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from pymongo import monitoring
+
+REGISTRY = CollectorRegistry()
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route and status",
+    ["method", "route", "status"], registry=REGISTRY,
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route, including streamed bodies",
+    ["method", "route"], registry=REGISTRY,
+)
+MONGO_COMMANDS = Counter(
+    "mongo_commands_total", "MongoDB commands by collection, command and outcome",
+    ["collection", "command", "outcome"], registry=REGISTRY,
+)
+MONGO_LATENCY = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency by collection and command",
+    ["collection", "command"], registry=REGISTRY,
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5),
+)
+UPSTREAM_CALLS = Counter(
+    "upstream_calls_total", "LLM and Stripe calls by operation and outcome",
+    ["upstream", "operation", "outcome"], registry=REGISTRY,
+)
+UPSTREAM_LATENCY = Histogram(
+    "upstream_call_duration_seconds", "LLM and Stripe call latency by operation",
+    ["upstream", "operation"], registry=REGISTRY,
+    buckets=(.05, .1, .25, .5, 1, 2.5, 5, 10, 20, 30, 60, 120),
+)
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+def render_metrics() -> bytes:
+    return generate_latest(REGISTRY)
+
+
+def observe_upstream(upstream: str, operation: str, outcome: str, seconds: float) -> None:
+    UPSTREAM_CALLS.labels(upstream, operation, outcome).inc()
+    UPSTREAM_LATENCY.labels(upstream, operation).observe(seconds)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each request under its route template.
+
+    Requests that match no route are grouped under ``unmatched`` so that
+    arbitrary paths cannot create unbounded label values.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            HTTP_REQUESTS.labels(method, path, str(status)).inc()
+            HTTP_LATENCY.labels(method, path).observe(time.perf_counter() - started)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every command the driver sends, by collection and command name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started: Dict[Tuple, Tuple[str, str]] = {}
+
+    @staticmethod
+    def _key(event) -> Tuple:
+        return (event.connection_id, event.request_id)
+
+    def started(self, event) -> None:
+        command = event.command_name
+        target = event.command.get(command)
+        if command == "getMore":
+            target = event.command.get("collection")
+        collection = target if isinstance(target, str) else "-"
+        with self._lock:
+            self._started[self._key(event)] = (collection, command)
+
+    def _finish(self, event, outcome: str) -> None:
+        with self._lock:
+            labels = self._started.pop(self._key(event), None)
+        if labels is None:
+            return
+        MONGO_COMMANDS.labels(*labels, outcome).inc()
+        MONGO_LATENCY.labels(*labels).observe(event.duration_micros / 1e6)
+
+    def succeeded(self, event) -> None:
+        self._finish(event, "success")
+
+    def failed(self, event) -> None:
+        self._finish(event, "failure")
+
+
+class StatsCollector:
+    """Exports nested numeric ``stats()`` values as ``app_component_stat`` gauges."""
+
+    def __init__(self, stats: Callable[[], dict]):
+        self.stats = stats
+
+    def collect(self):
+        family = GaugeMetricFamily(
+            "app_component_stat", "In-process component statistics (see /api/health)",
+            labels=["component", "stat"],
+        )
+        for component, values in self._flatten(self.stats()):
+            for stat, value in values.items():
+                family.add_metric([component, stat], float(value))
+        yield family
+
+    def _flatten(self, stats: dict, prefix: str = ""):
+        numeric = {}
+        for key, value in stats.items():
+            if isinstance(value, dict):
+                yield from self._flatten(value, f"{prefix}{key}.")
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                numeric[key] = value
+        if numeric:
+            yield prefix.rstrip(".") or "app", numeric
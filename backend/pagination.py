@@ -0,0 +1,36 @@
+"""Opaque continuation tokens for keyset pagination.
+
+A token is the sort key of the last item on a page, so fetching the next page
+is an index seek rather than a ``skip`` over every earlier row.
+"""
+import base64
+import json
+from typing import Any, List
+
+from fastapi import HTTPException
+
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, size: int) -> List[Any]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def descending_after(fields: List[str], values: List[Any]) -> dict:
+    """Filter for rows strictly after ``values`` in a descending sort on ``fields``."""
+    clauses = []
+    for i, field in enumerate(fields):
+        clause = {f: v for f, v in zip(fields[:i], values[:i])}
+        clause[field] = {"$lt": values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
@@ -0,0 +1,71 @@
+"""bcrypt hashing and verification off the event loop.
+
+bcrypt is deliberately slow (tens to hundreds of milliseconds per call), so
+running it inline in an async handler stalls every other request in the
+worker. ``PasswordService`` runs it on a dedicated thread pool (the bcrypt C
+extension releases the GIL) and refuses new work with ``PasswordServiceBusy``
+once ``queue_limit`` calls are already waiting for a thread.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from passlib.hash import bcrypt
+
+
+class PasswordServiceBusy(Exception):
+    """Raised when the hashing queue is full; callers should answer 503."""
+
+
+class PasswordService:
+    def __init__(self, workers: int, queue_limit: int, rounds: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.rounds = rounds
+        self.in_flight = 0
+        self.rejected = 0
+        # Pinning the desired range makes needs_update() flag hashes made with
+        # any other cost factor, whether it was raised or lowered.
+        self._hasher = bcrypt.using(
+            rounds=rounds, min_desired_rounds=rounds, max_desired_rounds=rounds
+        )
+        # Created on first use, so the service survives a shutdown() between
+        # two app lifespans in the same process
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def _run(self, fn, *args):
+        if self.in_flight >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise PasswordServiceBusy()
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self.in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self._hasher.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(self._hasher.verify, password, hashed)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """True when ``hashed`` was made with a different cost factor."""
+        return self._hasher.needs_update(hashed)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
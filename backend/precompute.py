@@ -0,0 +1,219 @@
+"""Background precomputation of LLM recommendations.
+
+``POST /api/recommendations`` answers from ``db.recommendations`` whenever a
+fresh entry exists for the user's current inputs (recommendations.py). This
+scheduler keeps such entries ahead of demand: each run walks the users whose
+finances changed since the previous run, i.e. whose rollups
+(``expense_rollups.updated_at``) or setup (``user_setups.updated_at``) moved,
+and regenerates the ones without a fresh recommendation for their current
+inputs. The inputs are those of the current month, so the first run of a
+month walks every user.
+
+* Runs hold a lease on the ``scheduler_state`` document, so with several
+  workers only one precomputes at a time. The lease names its owner and is
+  renewed at every checkpoint; a run that finds it taken over stops.
+* Users are walked in ``user_id`` order and the position is checkpointed
+  after every chunk, so a run stopped by a restart or by the budget resumes
+  where it left off.
+* ``max_per_run`` caps the LLM calls of a run; ``concurrency`` caps the calls
+  in flight, leaving the rest of the LLM pool to interactive requests.
+* Only users with an active subscription are precomputed.
+"""
+import asyncio
+import datetime
+import logging
+import time
+import uuid
+from typing import Awaitable, Callable, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from providers import UpstreamBusy
+from recommendations import RecommendationCache, fingerprint, load_financial_inputs
+
+logger = logging.getLogger(__name__)
+
+
+STATE_ID = "recommendations"
+
+
+class LeaseLost(Exception):
+    """Another worker took over the run lease."""
+
+
+# (user_id, inputs, fingerprint) -> recommendation text
+Generate = Callable[[str, dict, str], Awaitable[str]]
+
+
+class RecommendationScheduler:
+    def __init__(self, cache: RecommendationCache, interval: float, concurrency: int,
+                 max_per_run: int, lease_seconds: float = 600):
+        self.cache = cache
+        self.interval = interval
+        self.concurrency = concurrency
+        self.max_per_run = max_per_run
+        self.lease_seconds = lease_seconds
+        self.runs = 0
+        self.generated = 0
+        self.fresh = 0
+        self.failed = 0
+        self.deferred_runs = 0
+        self.last_run_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, db, generate: Generate) -> None:
+        """Run every ``interval`` seconds until ``stop``; a zero interval disables it."""
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._loop(db, generate))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self, db, generate: Generate) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once(db, generate)
+            except Exception:
+                logger.exception("Recommendation precompute run failed")
+
+    def _lease_until(self) -> datetime.datetime:
+        return datetime.datetime.utcnow() + datetime.timedelta(seconds=self.lease_seconds)
+
+    async def _claim(self, db) -> Optional[dict]:
+        """Take the run lease; the state document, or ``None`` if another worker holds it."""
+        now = datetime.datetime.utcnow()
+        try:
+            return await db.scheduler_state.find_one_and_update(
+                {"_id": STATE_ID, "$or": [{"lease_until": {"$lt": now}}, {"lease_until": None}]},
+                {"$set": {"lease_until": self._lease_until(), "owner": uuid.uuid4().hex}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            return None
+
+    async def _candidates(self, db, since: Optional[datetime.datetime], after: Optional[str]) -> List[str]:
+        match: dict = {"updated_at": {"$gt": since}} if since else {}
+        if after is not None:
+            match["user_id"] = {"$gt": after}
+        # A $group cursor rather than distinct, whose result is one document
+        # capped at 16 MB
+        pipeline = [{"$match": match}, {"$group": {"_id": "$user_id"}}]
+        user_ids = set()
+        for collection in (db.expense_rollups, db.user_setups):
+            async for group in collection.aggregate(pipeline):
+                user_ids.add(group["_id"])
+        return sorted(user_ids)
+
+    async def _refresh(self, db, generate: Generate, user_id: str, budget: List[int]) -> str:
+        inputs = await load_financial_inputs(db, user_id)
+        if inputs is None:
+            return "skipped"
+        inputs_fingerprint = fingerprint(inputs)
+        if await self.cache.fresh(db, user_id, inputs_fingerprint):
+            return "fresh"
+        if budget[0] <= 0:
+            return "deferred"
+        budget[0] -= 1
+        try:
+            await generate(user_id, inputs, inputs_fingerprint)
+        except UpstreamBusy:
+            return "deferred"
+        except Exception:
+            logger.exception("Could not precompute recommendations for %s", user_id)
+            return "failed"
+        return "generated"
+
+    async def run_once(self, db, generate: Generate) -> dict:
+        """One pass over the changed users, or a resumed part of it."""
+        state = await self._claim(db)
+        if state is None:
+            return {"status": "locked"}
+        started = time.perf_counter()
+        owner = state["owner"]
+        # A resumed run keeps its original start so changes made while it was
+        # paused are still picked up by the next one
+        run_started = state.get("run_started") or datetime.datetime.utcnow()
+        run_month = run_started.strftime("%Y-%m")
+        # Every fingerprint changes with the month, changed or not
+        since = state.get("since") if state.get("month") == run_month else None
+        candidates = await self._candidates(db, since, state.get("last_user_id"))
+        budget = [self.max_per_run]
+        outcomes = {"generated": 0, "fresh": 0, "skipped": 0, "failed": 0, "deferred": 0}
+
+        finished = False
+        try:
+            for offset in range(0, len(candidates), self.concurrency):
+                chunk = candidates[offset:offset + self.concurrency]
+                active = {
+                    user["user_id"] for user in await db.users.find(
+                        {"user_id": {"$in": chunk}, "subscription_status": "active"}, {"_id": 0, "user_id": 1}
+                    ).to_list(None)
+                }
+                results = await asyncio.gather(*(
+                    self._refresh(db, generate, user_id, budget) if user_id in active else _skipped()
+                    for user_id in chunk
+                ))
+                for result in results:
+                    outcomes[result] += 1
+                if "deferred" in results:
+                    # Resume just before the first user left without a recommendation
+                    position = offset + results.index("deferred")
+                    resume_after = candidates[position - 1] if position else state.get("last_user_id")
+                    await self._checkpoint(db, owner, run_started, resume_after)
+                    break
+                await self._checkpoint(db, owner, run_started, chunk[-1])
+            else:
+                finished = True
+        except LeaseLost:
+            logger.warning("Recommendation precompute lease was taken over; stopping this run")
+            return {"status": "lost", "candidates": len(candidates), **outcomes}
+        finally:
+            if finished:
+                release = {"$set": {"since": run_started, "month": run_month, "lease_until": None},
+                           "$unset": {"run_started": "", "last_user_id": "", "owner": ""}}
+            else:
+                release = {"$set": {"lease_until": None}, "$unset": {"owner": ""}}
+            # Only while the lease is still ours; a no-op after LeaseLost
+            await db.scheduler_state.update_one({"_id": STATE_ID, "owner": owner}, release)
+
+        self.runs += 1
+        self.generated += outcomes["generated"]
+        self.fresh += outcomes["fresh"]
+        self.failed += outcomes["failed"]
+        self.deferred_runs += 0 if finished else 1
+        self.last_run_ms = (time.perf_counter() - started) * 1000
+        return {"status": "finished" if finished else "deferred", "candidates": len(candidates), **outcomes}
+
+    async def _checkpoint(self, db, owner: str, run_started: datetime.datetime,
+                          last_user_id: Optional[str]) -> None:
+        """Record progress and renew the lease; raises ``LeaseLost`` if it is no longer ours."""
+        result = await db.scheduler_state.update_one(
+            {"_id": STATE_ID, "owner": owner},
+            {"$set": {"run_started": run_started, "last_user_id": last_user_id,
+                      "lease_until": self._lease_until()}},
+        )
+        if not result.matched_count:
+            raise LeaseLost()
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "generated": self.generated,
+            "fresh": self.fresh,
+            "failed": self.failed,
+            "deferred_runs": self.deferred_runs,
+            "last_run_ms": round(self.last_run_ms, 1),
+        }
+
+
+async def _skipped() -> str:
+    return "skipped"
@@ -0,0 +1,300 @@
+"""Long-lived clients for the LLM and Stripe upstreams.
+
+One ``Providers`` instance is created by the app lifespan and shared by every
+request, instead of building ``LlmChat``/``StripeCheckout`` objects and
+re-reading the environment per call. A single Stripe client (with the
+configured webhook URL) keeps its HTTP connections alive, and each
+upstream is fronted by an ``UpstreamPool`` that caps concurrent calls, applies
+a timeout and records utilization. Callers beyond the cap wait in a bounded
+queue for at most ``queue_timeout`` seconds; when the queue is full or the
+wait runs out the request is shed with ``UpstreamBusy`` (503) instead of
+piling up behind a saturated upstream.
+
+Handlers get the instance through the ``get_providers`` dependency, so tests
+can install stubs with ``app.state.providers = ...`` or a dependency override.
+The ``emergentintegrations`` SDK (and ``litellm``, used for streaming) is
+imported on first use: workers that never call an upstream do not pay for
+the import at startup, and the app (and such stubs) work where it is not
+installed.
+"""
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+
+from fastapi import HTTPException, Request
+
+from metrics import observe_upstream
+
+
+class UpstreamBusy(Exception):
+    """The upstream is saturated and its wait queue is full or timed out."""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"{name} upstream is busy")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class UpstreamPool:
+    """Caps concurrent calls to one upstream and records how busy it is."""
+
+    def __init__(self, name: str, limit: int, timeout: float,
+                 max_waiting: int = 64, queue_timeout: float = 10.0):
+        self.name = name
+        self.limit = limit
+        self.timeout = timeout
+        self.max_waiting = max_waiting
+        self.queue_timeout = queue_timeout
+        self.in_use = 0
+        self.waiting = 0
+        self.peak = 0
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.rejected_queue_full = 0
+        self.rejected_queue_timeout = 0
+        self.busy_seconds = 0.0
+        self.queued_seconds = 0.0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    def retry_after(self) -> int:
+        """Seconds a shed caller should wait: roughly one average call."""
+        average = self.busy_seconds / self.calls if self.calls else 1.0
+        return max(1, math.ceil(average))
+
+    def check_admission(self) -> None:
+        """Fail fast when a new caller could not even join the wait queue."""
+        if self.in_use + self.waiting >= self.limit + self.max_waiting:
+            self.rejected_queue_full += 1
+            raise UpstreamBusy(self.name, self.retry_after())
+
+    @asynccontextmanager
+    async def lease(self, operation: str = "call"):
+        self.check_admission()
+        self.waiting += 1
+        queued = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected_queue_timeout += 1
+            raise UpstreamBusy(self.name, self.retry_after())
+        finally:
+            self.waiting -= 1
+        self.queued_seconds += time.perf_counter() - queued
+
+        self.in_use += 1
+        self.peak = max(self.peak, self.in_use)
+        self.calls += 1
+        started = time.perf_counter()
+        # Stays "cancelled" if the caller goes away mid-call
+        outcome = "cancelled"
+        try:
+            yield
+            outcome = "success"
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            outcome = "timeout"
+            raise HTTPException(status_code=504, detail=f"{self.name} upstream timed out")
+        except Exception:
+            self.errors += 1
+            outcome = "error"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.busy_seconds += elapsed
+            self.in_use -= 1
+            self._semaphore.release()
+            observe_upstream(self.name, operation, outcome, elapsed)
+
+    async def call(self, fn, *args):
+        async with self.lease(fn.__name__):
+            return await asyncio.wait_for(fn(*args), self.timeout)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "peak": self.peak,
+            "utilization": self.in_use / self.limit,
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_queue_timeout": self.rejected_queue_timeout,
+            "avg_latency_ms": self.busy_seconds * 1000 / self.calls if self.calls else 0.0,
+            "avg_queue_ms": self.queued_seconds * 1000 / self.calls if self.calls else 0.0,
+        }
+
+
+# Emergent universal keys are served through the integrations proxy
+EMERGENT_KEY_PREFIX = "sk-emergent-"
+EMERGENT_LLM_API_BASE = "https://integrations.emergentagent.com/llm"
+
+
+class LlmProvider:
+    def __init__(self, api_key: Optional[str], pool: UpstreamPool,
+                 provider: str = "openai", model: str = "gpt-4o-mini",
+                 api_base: Optional[str] = None):
+        self.api_key = api_key
+        self.pool = pool
+        self.provider = provider
+        self.model = model
+        self.api_base = api_base
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key)
+
+    def _chat(self, session_id: str, system_message: str):
+        if not self.api_key:
+            raise HTTPException(status_code=500, detail="LLM service not configured")
+        from emergentintegrations.llm.chat import LlmChat
+        return LlmChat(
+            api_key=self.api_key,
+            session_id=session_id,
+            system_message=system_message
+        ).with_model(self.provider, self.model)
+
+    @staticmethod
+    def _message(text: str):
+        from emergentintegrations.llm.chat import UserMessage
+        return UserMessage(text=text)
+
+    async def send(self, session_id: str, system_message: str, text: str) -> str:
+        chat = self._chat(session_id, system_message)
+        return await self.pool.call(chat.send_message, self._message(text))
+
+    def _completion_api_base(self) -> Optional[str]:
+        if self.api_base:
+            return self.api_base
+        if self.api_key and self.api_key.startswith(EMERGENT_KEY_PREFIX):
+            return EMERGENT_LLM_API_BASE
+        return None
+
+    async def _stream_completion(self, system_message: str, text: str) -> AsyncIterator[str]:
+        """Token deltas from the provider's streaming chat completion API.
+
+        ``LlmChat`` only returns complete replies, so streaming goes to
+        litellm, the client it is built on, with the same key and model.
+        """
+        if not self.api_key:
+            raise HTTPException(status_code=500, detail="LLM service not configured")
+        import litellm
+
+        response = await litellm.acompletion(
+            model=f"{self.provider}/{self.model}",
+            messages=[
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": text},
+            ],
+            api_key=self.api_key,
+            api_base=self._completion_api_base(),
+            stream=True,
+        )
+        async for chunk in response:
+            if chunk.choices:
+                yield chunk.choices[0].delta.content or ""
+
+    async def stream(self, session_id: str, system_message: str, text: str) -> AsyncIterator[str]:
+        """Yield reply text as the model produces it.
+
+        The timeout applies to the gap between chunks, so a long reply that
+        keeps streaming is never cut off.
+        """
+        async with self.pool.lease("stream_message"):
+            deltas = self._stream_completion(system_message, text).__aiter__()
+            while True:
+                try:
+                    delta = await asyncio.wait_for(deltas.__anext__(), self.pool.timeout)
+                except StopAsyncIteration:
+                    return
+                if delta:
+                    yield delta
+
+
+class StripeProvider:
+    def __init__(self, api_key: Optional[str], pool: UpstreamPool, webhook_url: str = ""):
+        self.api_key = api_key
+        self.pool = pool
+        # Configured, never taken from a request, so one client serves everyone
+        self.webhook_url = webhook_url
+        self._checkout: Any = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key)
+
+    def _client(self):
+        if not self.api_key:
+            raise HTTPException(status_code=500, detail="Stripe not configured")
+        if self._checkout is None:
+            from emergentintegrations.payments.stripe.checkout import StripeCheckout
+            self._checkout = StripeCheckout(api_key=self.api_key, webhook_url=self.webhook_url)
+        return self._checkout
+
+    async def create_checkout_session(self, **request):
+        client = self._client()
+        from emergentintegrations.payments.stripe.checkout import CheckoutSessionRequest
+        return await self.pool.call(client.create_checkout_session, CheckoutSessionRequest(**request))
+
+    async def get_checkout_status(self, session_id: str):
+        return await self.pool.call(self._client().get_checkout_status, session_id)
+
+    async def handle_webhook(self, body: bytes, signature: Optional[str]):
+        return await self.pool.call(self._client().handle_webhook, body, signature)
+
+    async def aclose(self) -> None:
+        client, self._checkout = self._checkout, None
+        close = getattr(client, "aclose", None) or getattr(client, "close", None)
+        if close is not None:
+            result = close()
+            if asyncio.iscoroutine(result):
+                await result
+
+
+class Providers:
+    def __init__(self, llm: LlmProvider, stripe: StripeProvider):
+        self.llm = llm
+        self.stripe = stripe
+
+    @classmethod
+    def from_env(cls) -> "Providers":
+        return cls(
+            llm=LlmProvider(
+                api_key=os.environ.get('EMERGENT_LLM_KEY'),
+                pool=UpstreamPool(
+                    "llm",
+                    limit=int(os.environ.get('LLM_MAX_CONCURRENCY', 16)),
+                    timeout=float(os.environ.get('LLM_TIMEOUT_SECONDS', 60)),
+                    max_waiting=int(os.environ.get('LLM_MAX_QUEUE', 64)),
+                    queue_timeout=float(os.environ.get('LLM_QUEUE_TIMEOUT_SECONDS', 10)),
+                ),
+                api_base=os.environ.get('LLM_API_BASE'),
+            ),
+            stripe=StripeProvider(
+                api_key=os.environ.get('STRIPE_API_KEY'),
+                pool=UpstreamPool(
+                    "stripe",
+                    limit=int(os.environ.get('STRIPE_MAX_CONCURRENCY', 8)),
+                    timeout=float(os.environ.get('STRIPE_TIMEOUT_SECONDS', 20)),
+                    max_waiting=int(os.environ.get('STRIPE_MAX_QUEUE', 32)),
+                    queue_timeout=float(os.environ.get('STRIPE_QUEUE_TIMEOUT_SECONDS', 5)),
+                ),
+                webhook_url=os.environ.get('STRIPE_WEBHOOK_URL', ''),
+            ),
+        )
+
+    def stats(self) -> dict:
+        return {"llm": self.llm.pool.stats(), "stripe": self.stripe.pool.stats()}
+
+    async def aclose(self) -> None:
+        await self.stripe.aclose()
+
+
+def get_providers(request: Request) -> Providers:
+    return request.app.state.providers
@@ -0,0 +1,58 @@
+"""Per-user token-bucket rate limiting for expensive endpoints."""
+import math
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("Rate limit exceeded")
+        self.retry_after = retry_after
+
+
+class TokenBucketLimiter:
+    """Allows ``burst`` requests at once, refilled at ``rate`` per second.
+
+    Buckets are kept per worker process in a bounded LRU; a user evicted from
+    it simply starts again with a full bucket.
+    """
+
+    def __init__(self, rate: float, burst: int, maxsize: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self.allowed = 0
+        self.limited = 0
+        self._buckets: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def acquire(self, key: Hashable) -> None:
+        """Take one token for ``key`` or raise ``RateLimited``."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+
+        if tokens < 1:
+            self._store(key, tokens, now)
+            self.limited += 1
+            raise RateLimited(max(1, math.ceil((1 - tokens) / self.rate)))
+
+        self._store(key, tokens - 1, now)
+        self.allowed += 1
+
+    def _store(self, key: Hashable, tokens: float, now: float) -> None:
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+
+    def stats(self) -> dict:
+        decisions = self.allowed + self.limited
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "tracked_users": len(self._buckets),
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "limited_rate": self.limited / decisions if decisions else 0.0,
+        }
@@ -0,0 +1,114 @@
+"""Inputs, fingerprinting and caching for LLM financial recommendations.
+
+A recommendation depends only on the user's financial summary, so identical
+inputs within ``ttl`` seconds are answered from the stored
+``db.recommendations`` entry instead of calling the LLM again.
+"""
+import datetime
+import hashlib
+import json
+import time
+import uuid
+from typing import Dict, Optional
+
+from pymongo import DESCENDING
+
+from retention import expires_at
+from rollups import current_month, get_dashboard_rollup
+
+SYSTEM_MESSAGE = "You are a professional financial advisor. Provide practical, actionable advice."
+
+
+def financial_inputs(setup: dict, categories: Dict[str, float]) -> dict:
+    """Everything the recommendation prompt is built from, in canonical form."""
+    return {
+        "cash_balance": round(float(setup.get("cash_balance", 0)), 2),
+        "savings_balance": round(float(setup.get("savings_balance", 0)), 2),
+        "bank_accounts": sorted(setup.get("bank_accounts", [])),
+        "credit_cards": sorted(setup.get("credit_cards", [])),
+        "categories": {category: round(total, 2) for category, total in sorted(categories.items())},
+    }
+
+
+def fingerprint(inputs: dict) -> str:
+    canonical = json.dumps(inputs, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def financial_summary(inputs: dict) -> str:
+    total_expenses = sum(inputs["categories"].values())
+    return f"""
+    User Financial Profile:
+    - Cash Balance: ${inputs['cash_balance']:.2f}
+    - Savings Balance: ${inputs['savings_balance']:.2f}
+    - Bank Accounts: {', '.join(inputs['bank_accounts'])}
+    - Credit Cards: {', '.join(inputs['credit_cards'])}
+    - Total Monthly Expenses: ${total_expenses:.2f}
+    - Expense Categories: {inputs['categories']}
+
+    Please provide personalized financial recommendations including:
+    1. Areas where they can save money
+    2. Best credit card to use for rewards based on their spending
+    3. Where to invest excess cash for better returns
+    """
+
+
+async def load_financial_inputs(db, user_id: str) -> Optional[dict]:
+    """Current inputs of ``user_id``; ``None`` until the financial setup is done."""
+    setup = await db.user_setups.find_one({"user_id": user_id}, {"_id": 0})
+    if not setup:
+        return None
+    rollup = await get_dashboard_rollup(db, user_id, current_month())
+    return financial_inputs(setup, rollup["categories"])
+
+
+async def generate_recommendation(db, llm, user_id: str, inputs: dict, inputs_fingerprint: str) -> str:
+    """Ask the LLM for recommendations and store them under ``inputs_fingerprint``."""
+    started = time.perf_counter()
+    response = await llm.send(f"recommendations_{user_id}", SYSTEM_MESSAGE, financial_summary(inputs))
+    now = datetime.datetime.utcnow()
+    await db.recommendations.insert_one({
+        "recommendation_id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "recommendations": response,
+        "fingerprint": inputs_fingerprint,
+        "latency_ms": (time.perf_counter() - started) * 1000,
+        "created_at": now,
+        "expires_at": expires_at("recommendations", now),
+    })
+    return response
+
+
+class RecommendationCache:
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.saved_latency_ms = 0.0
+
+    async def fresh(self, db, user_id: str, inputs_fingerprint: str) -> Optional[dict]:
+        """Latest recommendation for these inputs within ``ttl``, without counting a lookup."""
+        fresh_after = datetime.datetime.utcnow() - datetime.timedelta(seconds=self.ttl)
+        return await db.recommendations.find_one(
+            {"user_id": user_id, "fingerprint": inputs_fingerprint, "created_at": {"$gte": fresh_after}},
+            {"_id": 0, "recommendations": 1, "latency_ms": 1, "created_at": 1},
+            sort=[("created_at", DESCENDING)],
+        )
+
+    async def lookup(self, db, user_id: str, inputs_fingerprint: str) -> Optional[dict]:
+        cached = await self.fresh(db, user_id, inputs_fingerprint)
+        if cached is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.saved_latency_ms += cached.get("latency_ms", 0)
+        return cached
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_latency_ms": round(self.saved_latency_ms, 1),
+        }
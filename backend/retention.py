@@ -0,0 +1,163 @@
+"""Retention of chat turns and recommendations.
+
+Both collections get one document per LLM call and are only read while
+recent, so old documents are moved out of MongoDB to keep the live
+collections (and the cache they occupy) small:
+
+* every document is written with ``expires_at``, ``created_at`` plus the
+  collection's retention plus ``ARCHIVE_GRACE_DAYS``; a TTL index on it
+  deletes whatever is still there, so the collections stay bounded even if
+  archival never runs;
+* ``archive_expired`` (``python manage.py archive-expired``, run from cron)
+  streams documents past their retention, one gzip NDJSON file per user and
+  run under ``ARCHIVE_DIR/<collection>/<user_id>/``, and deletes them once
+  the file is on disk, i.e. within the grace period before the TTL monitor
+  would. File names carry the run's id and are never overwritten;
+* ``restore_archive`` (``python manage.py restore-archive``) loads files
+  back for ``keep_days``. Restored documents are marked and not archived a
+  second time.
+
+A retention of 0 days keeps documents forever. Changing a retention applies
+to documents written afterwards; ``expires_at`` of existing ones is kept.
+Files use MongoDB extended JSON so dates and ids restore unchanged.
+"""
+import datetime
+import gzip
+import os
+import uuid
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from bson import json_util
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+RETENTION_DAYS: Dict[str, int] = {
+    "chat_history": int(os.environ.get('CHAT_HISTORY_RETENTION_DAYS', 180)),
+    "recommendations": int(os.environ.get('RECOMMENDATIONS_RETENTION_DAYS', 90)),
+}
+ARCHIVE_GRACE_DAYS = int(os.environ.get('ARCHIVE_GRACE_DAYS', 7))
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', 'archive')
+
+JSON_OPTIONS = json_util.RELAXED_JSON_OPTIONS
+
+
+def expires_at(collection: str, created_at: datetime.datetime) -> Optional[datetime.datetime]:
+    """TTL deadline of a new document; ``None`` (never) when retention is off."""
+    days = RETENTION_DAYS[collection]
+    if not days:
+        return None
+    return created_at + datetime.timedelta(days=days + ARCHIVE_GRACE_DAYS)
+
+
+async def backfill_expires_at(db, collection: str, batch_size: int) -> int:
+    """Give documents written before retention existed their ``expires_at``."""
+    if not RETENTION_DAYS[collection]:
+        return 0
+    updated = 0
+    while True:
+        # Missing fields are indexed as null, so this is an index lookup
+        batch = await db[collection].find(
+            {"expires_at": None, "created_at": {"$type": "date"}}, {"_id": 1, "created_at": 1}
+        ).limit(batch_size).to_list(batch_size)
+        if not batch:
+            return updated
+        result = await db[collection].bulk_write([
+            UpdateOne({"_id": document["_id"]},
+                      {"$set": {"expires_at": expires_at(collection, document["created_at"])}})
+            for document in batch
+        ], ordered=False)
+        updated += result.modified_count
+
+
+def archive_path(archive_dir: str, collection: str, user_id: str, now: datetime.datetime, run_id: str) -> Path:
+    return Path(archive_dir) / collection / user_id / f"{now:%Y%m%dT%H%M%SZ}-{run_id}.ndjson.gz"
+
+
+async def archive_user(db, collection: str, user_id: str, query: dict, path: Path, batch_size: int) -> int:
+    """Write the user's matching documents to ``path``, then delete them."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + ".partial")
+    archived: List = []
+    cursor = db[collection].find({**query, "user_id": user_id}, batch_size=batch_size).sort("expires_at", 1)
+    with gzip.open(partial, "wt", encoding="utf-8") as out:
+        async for document in cursor:
+            out.write(json_util.dumps(document, json_options=JSON_OPTIONS) + "\n")
+            archived.append(document["_id"])
+    with open(partial, "rb") as written:
+        os.fsync(written.fileno())
+    if not archived:
+        partial.unlink()
+        return 0
+    # Only delete what is durably in the file. Linking fails rather than
+    # replace an existing archive
+    os.link(partial, path)
+    partial.unlink()
+    for start in range(0, len(archived), batch_size):
+        await db[collection].delete_many({"_id": {"$in": archived[start:start + batch_size]}})
+    return len(archived)
+
+
+async def archive_expired(db, collection: str, archive_dir: str = ARCHIVE_DIR,
+                          batch_size: int = 1000) -> Dict[str, int]:
+    """Archive and delete every document of ``collection`` past its retention."""
+    now = datetime.datetime.utcnow()
+    run_id = uuid.uuid4().hex[:12]
+    backfilled = await backfill_expires_at(db, collection, batch_size)
+    # expires_at is retention + grace after creation
+    query = {
+        "expires_at": {"$lte": now + datetime.timedelta(days=ARCHIVE_GRACE_DAYS)},
+        "restored_at": None,
+    }
+    users = archived = 0
+    for user_id in await db[collection].distinct("user_id", query):
+        count = await archive_user(
+            db, collection, user_id, query, archive_path(archive_dir, collection, user_id, now, run_id), batch_size
+        )
+        users += 1 if count else 0
+        archived += count
+    return {"backfilled": backfilled, "users": users, "archived": archived}
+
+
+def archive_files(path: Path) -> Iterator[Path]:
+    if path.is_file():
+        yield path
+    else:
+        yield from sorted(path.rglob("*.ndjson.gz"))
+
+
+async def restore_archive(db, path: str, keep_days: int, collection: Optional[str] = None,
+                          batch_size: int = 1000) -> Dict[str, int]:
+    """Load archived documents back for ``keep_days``; already present ones are skipped.
+
+    The collection defaults to the one the file was archived from
+    (``<collection>/<user_id>/<file>``).
+    """
+    now = datetime.datetime.utcnow()
+    restore_fields = {"restored_at": now, "expires_at": now + datetime.timedelta(days=keep_days)}
+    files = restored = skipped = 0
+
+    async def insert(target: str, documents: List[dict]) -> None:
+        nonlocal restored, skipped
+        try:
+            result = await db[target].insert_many(documents, ordered=False)
+            restored += len(result.inserted_ids)
+        except BulkWriteError as e:
+            restored += e.details.get("nInserted", 0)
+            skipped += len(e.details.get("writeErrors", []))
+
+    for file in archive_files(Path(path)):
+        target = collection or file.parent.parent.name
+        batch: List[dict] = []
+        with gzip.open(file, "rt", encoding="utf-8") as lines:
+            for line in lines:
+                if not line.strip():
+                    continue
+                batch.append({**json_util.loads(line, json_options=JSON_OPTIONS), **restore_fields})
+                if len(batch) >= batch_size:
+                    await insert(target, batch)
+                    batch = []
+        if batch:
+            await insert(target, batch)
+        files += 1
+    return {"files": files, "restored": restored, "skipped": skipped}
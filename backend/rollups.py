@@ -0,0 +1,130 @@
+"""Per-user monthly expense rollups.
+
+``expense_rollups`` holds one document per (user_id, month, category) with the
+running ``total_cents`` and ``count`` of the matching expenses. Every write path on
+``db.expenses`` must call ``apply_expenses`` with the documents it inserted
+(``sign=1``) or removed (``sign=-1``) so that the dashboard can read a month in
+O(categories) instead of summing raw expenses.
+
+Inserts into a category with a budget also check its alert thresholds
+(budgets.py) from the total returned by the same update.
+"""
+import datetime
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+
+from budgets import get_limits, record_crossings
+from expense_schema import cents_of, from_cents, month_of
+
+
+def current_month() -> str:
+    return datetime.datetime.utcnow().strftime("%Y-%m")
+
+
+async def apply_expenses(db, expenses: Iterable[dict], sign: int = 1) -> None:
+    """Fold inserted (sign=1) or deleted (sign=-1) expenses into the rollups."""
+    deltas: Dict[Tuple[str, str, str], List[int]] = defaultdict(lambda: [0, 0])
+    for expense in expenses:
+        key = (expense["user_id"], month_of(expense), expense["category"])
+        deltas[key][0] += sign * cents_of(expense)
+        deltas[key][1] += sign
+
+    if not deltas:
+        return
+
+    limits: Dict[str, Dict[str, int]] = {}
+    if sign > 0:
+        for user_id in {user_id for user_id, _, _ in deltas}:
+            limits[user_id] = await get_limits(db, user_id)
+
+    now = datetime.datetime.utcnow()
+    operations = []
+    for (user_id, month, category), (total, count) in deltas.items():
+        selector = {"user_id": user_id, "month": month, "category": category}
+        update = {"$inc": {"total_cents": total, "count": count}, "$set": {"updated_at": now}}
+        if category not in limits.get(user_id, {}):
+            operations.append(UpdateOne(selector, update, upsert=True))
+            continue
+        rollup = await db.expense_rollups.find_one_and_update(
+            selector, update, projection={"total_cents": 1},
+            upsert=True, return_document=ReturnDocument.AFTER,
+        )
+        after = rollup.get("total_cents", 0)
+        await record_crossings(db, user_id, month, [(category, after - total, after)], limits[user_id])
+    if operations:
+        await db.expense_rollups.bulk_write(operations, ordered=False)
+
+
+async def get_dashboard_rollup(db, user_id: str, month: str) -> dict:
+    """Category totals for ``month`` plus the user's lifetime expense count."""
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$facet": {
+            "month": [
+                {"$match": {"month": month, "count": {"$gt": 0}}},
+                {"$project": {"_id": 0, "category": 1, "total_cents": 1, "total": 1}},
+            ],
+            "lifetime": [
+                {"$group": {"_id": None, "count": {"$sum": "$count"}}},
+            ],
+        }},
+    ]
+    result = await db.expense_rollups.aggregate(pipeline).to_list(1)
+    facets = result[0] if result else {"month": [], "lifetime": []}
+
+    # A float "total" only exists on rollups built before expenses were
+    # stored in cents; rebuild_rollups replaces them
+    cents = {row["category"]: row.get("total_cents", 0) + round(row.get("total", 0) * 100)
+             for row in facets["month"]}
+    return {
+        "categories": {category: from_cents(total) for category, total in cents.items()},
+        "month_total": from_cents(sum(cents.values())),
+        "lifetime_count": facets["lifetime"][0]["count"] if facets["lifetime"] else 0,
+    }
+
+
+async def rebuild_rollups(db, user_id: Optional[str] = None) -> int:
+    """Recompute rollups from ``db.expenses``; returns the number of rollup docs.
+
+    Rollups are merged in place and stale ones removed afterwards, so the
+    dashboard never sees an empty collection while a rebuild is running.
+    """
+    started_at = datetime.datetime.utcnow()
+    match = {"user_id": user_id} if user_id else {}
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "user_id": "$user_id",
+                # Legacy documents (string date, float amount) are still
+                # counted so a rebuild is correct mid-migration
+                "month": {"$ifNull": ["$month", {"$substrBytes": ["$date", 0, 7]}]},
+                "category": "$category",
+            },
+            "total_cents": {"$sum": {"$ifNull": [
+                "$amount_cents", {"$toLong": {"$round": [{"$multiply": ["$amount", 100]}, 0]}}
+            ]}},
+            "count": {"$sum": 1},
+        }},
+        {"$project": {
+            "_id": 0,
+            "user_id": "$_id.user_id",
+            "month": "$_id.month",
+            "category": "$_id.category",
+            "total_cents": 1,
+            "count": 1,
+            "updated_at": started_at,
+        }},
+        {"$merge": {
+            "into": "expense_rollups",
+            "on": ["user_id", "month", "category"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert",
+        }},
+    ]
+    await db.expenses.aggregate(pipeline).to_list(None)
+
+    await db.expense_rollups.delete_many({**match, "updated_at": {"$lt": started_at}})
+    return await db.expense_rollups.count_documents(match)
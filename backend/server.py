@@ -1,26 +1,108 @@
-from fastapi import FastAPI, HTTPException, Depends, Request, File, UploadFile
+from fastapi import FastAPI, HTTPException, Depends, Request, File, UploadFile, Query, Form, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List, Dict, Any
+from fastapi.responses import JSONResponse, ORJSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, EmailStr, Field, ValidationError
+from typing import Annotated, Optional, List, Dict, Any
 import os
 import uuid
+import asyncio
 import datetime
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
 import hashlib
 import jwt
-from passlib.hash import bcrypt
-from emergentintegrations.llm.chat import LlmChat, UserMessage
-from emergentintegrations.payments.stripe.checkout import (
-    StripeCheckout, CheckoutSessionResponse, CheckoutStatusResponse, CheckoutSessionRequest
-)
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from contextlib import asynccontextmanager
 import json
+from indexes import ensure_indexes
+from rollups import apply_expenses, current_month, get_dashboard_rollup
+from budgets import limits_from_setup, reset_month_alerts
+from expense_schema import AMOUNT_FIELDS, date_range, date_string, from_cents, to_api, to_cents, to_storage_date
+from cache import TTLCache, SingleFlight
+from passwords import PasswordService, PasswordServiceBusy
+from pagination import encode_cursor, decode_cursor, descending_after
+from exporters import EXPORTERS, EXPORT_FIELDS, EXPORT_FORMATS, gzip_stream, parquet_available
+from ingest import ExpenseBatchWriter, new_expense_document
+from statements import StatementImporter, StatementTooLarge, UploadSizeLimit, is_supported
+from recommendations import RecommendationCache, financial_inputs, fingerprint, generate_recommendation
+from providers import Providers, UpstreamBusy, get_providers
+from ratelimit import RateLimited, TokenBucketLimiter
+from loader import RequestLoader
+from webhooks import StripeEventQueue
+from precompute import RecommendationScheduler
+from conversations import build_prompt, get_or_create_conversation, record_turn, summarize_overflow
+from metrics import METRICS_CONTENT_TYPE, REGISTRY, MetricsMiddleware, MongoCommandListener, StatsCollector, render_metrics
+from starlette.concurrency import run_in_threadpool
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="Financial Management SaaS")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client, db
+    # The Mongo client belongs to the running worker; tests may preinstall one
+    owns_client = client is None
+    if owns_client:
+        client = create_mongo_client()
+        db = client[DB_NAME]
+        await warm_mongo_pool(client)
+    # Create declared indexes before serving traffic
+    await ensure_indexes(db)
+    # Statement jobs run in-process; fail the ones a stopped worker left behind
+    await statement_importer.fail_stale_jobs(db)
+    # Upstream clients live for the whole process; tests may preinstall stubs
+    if getattr(app.state, "providers", None) is None:
+        app.state.providers = Providers.from_env()
+    await stripe_events.start(db)
+    recommendation_scheduler.start(db, precompute_recommendation)
+    yield
+    await recommendation_scheduler.stop()
+    await stripe_events.stop()
+    await app.state.providers.aclose()
+    password_service.shutdown()
+    statement_importer.shutdown()
+    if owns_client:
+        client.close()
+        client = db = None
+
+# Responses are encoded with orjson; list endpoints declare response models so
+# FastAPI serializes them in one pydantic-core pass instead of jsonable_encoder
+app = FastAPI(
+    title="Financial Management SaaS",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
+)
+
+@app.exception_handler(PasswordServiceBusy)
+async def password_service_busy_handler(request: Request, exc: PasswordServiceBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Authentication is busy, please retry"},
+        headers={"Retry-After": "1"}
+    )
+
+@app.exception_handler(UpstreamBusy)
+async def upstream_busy_handler(request: Request, exc: UpstreamBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"The {exc.name} service is busy, please retry"},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.exception_handler(RateLimited)
+async def rate_limited_handler(request: Request, exc: RateLimited):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many requests, please slow down"},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+# Statement uploads are capped while the body is received, not after
+app.add_middleware(UploadSizeLimit, path="/api/expenses/upload")
+
+# Per-route latency and status counts, exported on /api/metrics
+app.add_middleware(MetricsMiddleware)
 
 # CORS setup
 app.add_middleware(
@@ -31,15 +113,65 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# MongoDB connection
+# MongoDB connection, created by the lifespan of each worker
 MONGO_URL = os.environ.get('MONGO_URL')
 DB_NAME = os.environ.get('DB_NAME', 'financial_saas')
-client = AsyncIOMotorClient(MONGO_URL)
-db = client[DB_NAME]
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', 100))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', 10))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', 300000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', 5000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', 10000))
+READY_TIMEOUT_SECONDS = float(os.environ.get('READY_TIMEOUT_SECONDS', 2))
+# Motor builds its classes at runtime, so mypy cannot use them as types
+client: Any = None  # AsyncIOMotorClient
+db: Any = None  # AsyncIOMotorDatabase
+
+def create_mongo_client() -> Any:
+    return AsyncIOMotorClient(
+        MONGO_URL,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+        connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        event_listeners=[MongoCommandListener()]
+    )
+
+async def warm_mongo_pool(mongo_client: Any) -> None:
+    """Open connections before the first request instead of during it."""
+    connections = max(MONGO_MIN_POOL_SIZE, 1)
+    # Concurrent pings each check out their own connection
+    await asyncio.gather(*(mongo_client.admin.command("ping") for _ in range(connections)))
 
 # JWT Secret
 JWT_SECRET = "your-secret-key-change-in-production"
 
+# Authenticated user documents, keyed by user_id. Every path that updates a
+# user document must invalidate its entry.
+user_cache = TTLCache(
+    maxsize=int(os.environ.get('USER_CACHE_SIZE', 10000)),
+    ttl=float(os.environ.get('USER_CACHE_TTL_SECONDS', 30)),
+)
+
+# Per-user budget for requests that reach the LLM, on top of the global
+# concurrency cap and wait queue of the LLM upstream pool
+llm_rate_limiter = TokenBucketLimiter(
+    rate=float(os.environ.get('LLM_USER_RATE_PER_MINUTE', 20)) / 60,
+    burst=int(os.environ.get('LLM_USER_BURST', 5)),
+)
+
+# Verified Stripe events are recorded once and applied in the background
+stripe_events = StripeEventQueue(on_activated=user_cache.invalidate)
+
+# bcrypt runs on its own thread pool so logins never block the event loop
+password_service = PasswordService(
+    workers=int(os.environ.get('BCRYPT_WORKERS', os.cpu_count() or 2)),
+    queue_limit=int(os.environ.get('BCRYPT_QUEUE_LIMIT', 64)),
+    rounds=int(os.environ.get('BCRYPT_ROUNDS', 12)),
+)
+
 # Subscription packages
 SUBSCRIPTION_PACKAGES = {
     "monthly": 29.00,  # Monthly subscription
@@ -60,26 +192,92 @@ class UserSetup(BaseModel):
     cash_balance: float
     savings_balance: float
 
+class BudgetsUpdate(BaseModel):
+    # Monthly limit per category; categories left out have no budget. Limits
+    # are stored in cents, so anything under a cent would be a zero limit
+    budgets: Dict[str, Annotated[float, Field(ge=0.01, allow_inf_nan=False)]]
+
 class ExpenseCreate(BaseModel):
+    date: datetime.date
+    category: str
+    amount: float = Field(allow_inf_nan=False)
+    payment_method: str
+    notes: Optional[str] = None
+
+class ChatMessage(BaseModel):
+    message: str
+    conversation_id: Optional[str] = None
+
+# Response models
+class ExpenseItem(BaseModel):
+    expense_id: str
     date: str
     category: str
     amount: float
     payment_method: str
     notes: Optional[str] = None
 
-class ChatMessage(BaseModel):
+class ExpenseListResponse(BaseModel):
+    expenses: List[ExpenseItem]
+    next_cursor: Optional[str] = None
+
+class ChatTurn(BaseModel):
+    chat_id: str
+    conversation_id: Optional[str] = None
     message: str
+    response: str
+    created_at: datetime.datetime
+
+class ChatHistoryResponse(BaseModel):
+    history: List[ChatTurn]
+    next_cursor: Optional[str] = None
+
+class ConversationItem(BaseModel):
+    conversation_id: str
+    title: str
+    turn_count: int
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+
+class ConversationListResponse(BaseModel):
+    conversations: List[ConversationItem]
+    next_cursor: Optional[str] = None
+
+class BudgetAlertItem(BaseModel):
+    category: str
+    threshold: int
+    spent: float
+    limit: float
+
+class DashboardResponse(BaseModel):
+    monthly_expenses: float
+    category_breakdown: Dict[str, float]
+    recent_recommendations: List[str]
+    cash_balance: float
+    savings_balance: float
+    total_expenses: int
+    budget_alerts: List[BudgetAlertItem]
+
+class BudgetItem(BaseModel):
+    category: str
+    limit: float
+    spent: float
+    percent: float
+
+class BudgetsResponse(BaseModel):
+    month: str
+    budgets: List[BudgetItem]
 
 class CheckoutRequest(BaseModel):
     package_id: str
     origin_url: str
 
 # Helper functions
-def hash_password(password: str) -> str:
-    return bcrypt.hash(password)
+async def hash_password(password: str) -> str:
+    return await password_service.hash(password)
 
-def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.verify(password, hashed)
+async def verify_password(password: str, hashed: str) -> bool:
+    return await password_service.verify(password, hashed)
 
 def create_jwt_token(user_data: dict) -> str:
     payload = {
@@ -98,6 +296,13 @@ def decode_jwt_token(token: str) -> dict:
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+def get_loader(request: Request) -> RequestLoader:
+    """Loader shared by every dependency and handler of one request."""
+    loader = getattr(request.state, "loader", None)
+    if loader is None:
+        loader = request.state.loader = RequestLoader(db)
+    return loader
+
 async def get_current_user(request: Request):
     auth_header = request.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
@@ -106,23 +311,28 @@ async def get_current_user(request: Request):
     token = auth_header.split(" ")[1]
     payload = decode_jwt_token(token)
     
-    user = await db.users.find_one({"user_id": payload["user_id"]})
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
+    user = user_cache.get(payload["user_id"])
+    if user is None:
+        epoch = user_cache.epoch()
+        user = await db.users.find_one({"user_id": payload["user_id"]}, {"_id": 0, "password": 0})
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        user_cache.set(payload["user_id"], user, epoch)
     
+    get_loader(request).prime("users", "user_id", user["user_id"], user)
     return user
 
 # Authentication endpoints
 @app.post("/api/auth/signup")
 async def signup(user: UserCreate):
     # Check if user exists
-    existing_user = await db.users.find_one({"email": user.email})
+    existing_user = await db.users.find_one({"email": user.email}, {"_id": 1})
     if existing_user:
         raise HTTPException(status_code=400, detail="User already exists")
     
     # Create user
     user_id = str(uuid.uuid4())
-    hashed_password = hash_password(user.password)
+    hashed_password = await hash_password(user.password)
     
     user_data = {
         "user_id": user_id,
@@ -133,7 +343,11 @@ async def signup(user: UserCreate):
         "setup_completed": False
     }
     
-    await db.users.insert_one(user_data)
+    try:
+        await db.users.insert_one(user_data)
+    except DuplicateKeyError:
+        # Concurrent signup with the same email lost the race on users.email
+        raise HTTPException(status_code=400, detail="User already exists")
     
     # Create JWT token
     token = create_jwt_token({"user_id": user_id, "email": user.email})
@@ -148,10 +362,21 @@ async def signup(user: UserCreate):
 @app.post("/api/auth/login")
 async def login(user: UserLogin):
     # Find user
-    existing_user = await db.users.find_one({"email": user.email})
-    if not existing_user or not verify_password(user.password, existing_user["password"]):
+    existing_user = await db.users.find_one(
+        {"email": user.email},
+        {"_id": 0, "user_id": 1, "email": 1, "password": 1, "subscription_status": 1, "setup_completed": 1}
+    )
+    if not existing_user or not await verify_password(user.password, existing_user["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
+    # Upgrade hashes made with an old cost factor while we have the plaintext
+    if password_service.needs_rehash(existing_user["password"]):
+        await db.users.update_one(
+            {"user_id": existing_user["user_id"]},
+            {"$set": {"password": await hash_password(user.password)}}
+        )
+        user_cache.invalidate(existing_user["user_id"])
+    
     # Create JWT token
     token = create_jwt_token({
         "user_id": existing_user["user_id"],
@@ -168,27 +393,22 @@ async def login(user: UserLogin):
 
 # Subscription endpoints
 @app.post("/api/subscription/checkout")
-async def create_checkout_session(request: CheckoutRequest, current_user: dict = Depends(get_current_user)):
+async def create_checkout_session(
+    request: CheckoutRequest,
+    current_user: dict = Depends(get_current_user),
+    providers: Providers = Depends(get_providers)
+):
     if request.package_id not in SUBSCRIPTION_PACKAGES:
         raise HTTPException(status_code=400, detail="Invalid package")
     
     amount = SUBSCRIPTION_PACKAGES[request.package_id]
-    stripe_api_key = os.environ.get('STRIPE_API_KEY')
-    
-    if not stripe_api_key:
-        raise HTTPException(status_code=500, detail="Stripe not configured")
     
     # Create success and cancel URLs
     success_url = f"{request.origin_url}/subscription/success?session_id={{CHECKOUT_SESSION_ID}}"
     cancel_url = f"{request.origin_url}/subscription/cancel"
     
-    # Initialize Stripe checkout
-    host_url = request.origin_url
-    webhook_url = f"{host_url}/api/webhook/stripe"
-    stripe_checkout = StripeCheckout(api_key=stripe_api_key, webhook_url=webhook_url)
-    
-    # Create checkout session
-    checkout_request = CheckoutSessionRequest(
+    # Create checkout session; the webhook URL is configured (STRIPE_WEBHOOK_URL)
+    session = await providers.stripe.create_checkout_session(
         amount=amount,
         currency="usd",
         success_url=success_url,
@@ -200,8 +420,6 @@ async def create_checkout_session(request: CheckoutRequest, current_user: dict =
         }
     )
     
-    session = await stripe_checkout.create_checkout_session(checkout_request)
-    
     # Store payment transaction
     payment_data = {
         "payment_id": str(uuid.uuid4()),
@@ -227,89 +445,101 @@ async def create_checkout_session(request: CheckoutRequest, current_user: dict =
         "session_id": session.session_id
     }
 
-@app.get("/api/subscription/status/{session_id}")
-async def get_payment_status(session_id: str, current_user: dict = Depends(get_current_user)):
-    stripe_api_key = os.environ.get('STRIPE_API_KEY')
-    
-    if not stripe_api_key:
-        raise HTTPException(status_code=500, detail="Stripe not configured")
-    
-    # Initialize Stripe checkout
-    stripe_checkout = StripeCheckout(api_key=stripe_api_key, webhook_url="")
-    
-    # Get checkout status
-    checkout_status = await stripe_checkout.get_checkout_status(session_id)
-    
-    # Update payment transaction
-    transaction = await db.payment_transactions.find_one({"session_id": session_id})
-    if transaction:
-        update_data = {
-            "payment_status": checkout_status.payment_status,
-            "status": checkout_status.status,
-            "updated_at": datetime.datetime.utcnow()
-        }
-        
-        await db.payment_transactions.update_one(
-            {"session_id": session_id},
-            {"$set": update_data}
-        )
-        
-        # If payment successful, update user subscription
-        if checkout_status.payment_status == "paid" and transaction.get("payment_status") != "paid":
-            await db.users.update_one(
-                {"user_id": transaction["user_id"]},
-                {"$set": {"subscription_status": "active"}}
-            )
-    
+# Checkout sessions in these states never change again, so polls for them are
+# answered from payment_transactions without calling Stripe
+TERMINAL_CHECKOUT_STATUSES = {"complete", "expired"}
+CHECKOUT_POLL_INTERVAL_SECONDS = float(os.environ.get('CHECKOUT_POLL_INTERVAL_SECONDS', 2))
+
+# Stripe status of sessions still open, shared by concurrent and repeated polls
+checkout_status_cache = TTLCache(
+    maxsize=int(os.environ.get('CHECKOUT_STATUS_CACHE_SIZE', 10000)),
+    ttl=float(os.environ.get('CHECKOUT_STATUS_TTL_SECONDS', 2)),
+)
+checkout_status_flights = SingleFlight()
+
+def is_terminal_checkout(transaction: dict) -> bool:
+    return (
+        transaction.get("payment_status") == "paid"
+        or transaction.get("status") in TERMINAL_CHECKOUT_STATUSES
+    )
+
+def checkout_status_response(transaction: dict) -> dict:
+    terminal = is_terminal_checkout(transaction)
     return {
+        "status": transaction.get("status"),
+        "payment_status": transaction.get("payment_status"),
+        "amount_total": transaction.get("amount_total", int(round(transaction.get("amount", 0) * 100))),
+        "currency": transaction.get("currency"),
+        # Seconds the client should wait before polling again; None once final
+        "poll_interval": None if terminal else CHECKOUT_POLL_INTERVAL_SECONDS
+    }
+
+async def refresh_checkout_status(providers: Providers, session_id: str) -> dict:
+    checkout_status = await providers.stripe.get_checkout_status(session_id)
+    fields = {
         "status": checkout_status.status,
         "payment_status": checkout_status.payment_status,
         "amount_total": checkout_status.amount_total,
         "currency": checkout_status.currency
     }
+    
+    # One write that also returns the previous payment state
+    previous = await db.payment_transactions.find_one_and_update(
+        {"session_id": session_id},
+        {"$set": {**fields, "updated_at": datetime.datetime.utcnow()}},
+        projection={"user_id": 1, "payment_status": 1}
+    )
+    
+    # If payment successful, update user subscription
+    if previous and checkout_status.payment_status == "paid" and previous.get("payment_status") != "paid":
+        await db.users.update_one(
+            {"user_id": previous["user_id"]},
+            {"$set": {"subscription_status": "active"}}
+        )
+        user_cache.invalidate(previous["user_id"])
+    
+    checkout_status_cache.set(session_id, fields)
+    return fields
 
-@app.post("/api/webhook/stripe")
-async def stripe_webhook(request: Request):
-    stripe_api_key = os.environ.get('STRIPE_API_KEY')
+@app.get("/api/subscription/status/{session_id}")
+async def get_payment_status(
+    session_id: str,
+    current_user: dict = Depends(get_current_user),
+    providers: Providers = Depends(get_providers)
+):
+    transaction = await db.payment_transactions.find_one(
+        {"session_id": session_id},
+        {"_id": 0, "status": 1, "payment_status": 1, "amount": 1, "amount_total": 1, "currency": 1}
+    )
+    if transaction and is_terminal_checkout(transaction):
+        return checkout_status_response(transaction)
     
-    if not stripe_api_key:
+    fields = checkout_status_cache.get(session_id)
+    if fields is None:
+        fields = await checkout_status_flights.do(
+            session_id, lambda: refresh_checkout_status(providers, session_id)
+        )
+    return checkout_status_response(fields)
+
+@app.post("/api/webhook/stripe")
+async def stripe_webhook(request: Request, providers: Providers = Depends(get_providers)):
+    if not providers.stripe.configured:
         raise HTTPException(status_code=500, detail="Stripe not configured")
     
     body = await request.body()
     signature = request.headers.get("Stripe-Signature")
     
-    # Initialize Stripe checkout
-    stripe_checkout = StripeCheckout(api_key=stripe_api_key, webhook_url="")
-    
     try:
-        webhook_response = await stripe_checkout.handle_webhook(body, signature)
-        
-        # Handle successful payment
-        if webhook_response.payment_status == "paid":
-            session_id = webhook_response.session_id
-            
-            # Update payment transaction
-            await db.payment_transactions.update_one(
-                {"session_id": session_id},
-                {"$set": {
-                    "payment_status": "paid",
-                    "status": "completed",
-                    "updated_at": datetime.datetime.utcnow()
-                }}
-            )
-            
-            # Update user subscription status
-            transaction = await db.payment_transactions.find_one({"session_id": session_id})
-            if transaction:
-                await db.users.update_one(
-                    {"user_id": transaction["user_id"]},
-                    {"$set": {"subscription_status": "active"}}
-                )
-        
-        return {"status": "success"}
-    
+        webhook_response = await providers.stripe.handle_webhook(body, signature)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    
+    # Redeliveries hit the unique event_id index and are acknowledged as is
+    duplicate = not await stripe_events.record(db, webhook_response)
+    
+    return {"status": "success", "duplicate": duplicate}
 
 # User setup endpoints
 @app.post("/api/user/setup")
@@ -339,12 +569,16 @@ async def setup_user(setup: UserSetup, current_user: dict = Depends(get_current_
         {"user_id": current_user["user_id"]},
         {"$set": {"setup_completed": True}}
     )
+    user_cache.invalidate(current_user["user_id"])
     
     return {"message": "Setup completed successfully"}
 
 @app.get("/api/user/setup")
-async def get_user_setup(current_user: dict = Depends(get_current_user)):
-    setup = await db.user_setups.find_one({"user_id": current_user["user_id"]})
+async def get_user_setup(
+    current_user: dict = Depends(get_current_user),
+    loader: RequestLoader = Depends(get_loader)
+):
+    setup = await loader.load("user_setups", "user_id", current_user["user_id"])
     if not setup:
         return {"message": "Setup not found"}
     
@@ -355,207 +589,561 @@ async def get_user_setup(current_user: dict = Depends(get_current_user)):
         "savings_balance": setup.get("savings_balance", 0)
     }
 
+# Budget endpoints
+async def budgets_response(user_id: str, setup: Optional[dict]) -> dict:
+    month = current_month()
+    limits = limits_from_setup(setup)
+    rollups = await db.expense_rollups.find(
+        {"user_id": user_id, "month": month, "category": {"$in": list(limits)}},
+        {"_id": 0, "category": 1, "total_cents": 1}
+    ).to_list(None)
+    spent = {rollup["category"]: rollup.get("total_cents", 0) for rollup in rollups}
+    return {
+        "month": month,
+        "budgets": [
+            {
+                "category": category,
+                "limit": from_cents(limit_cents),
+                "spent": from_cents(spent.get(category, 0)),
+                "percent": round(spent.get(category, 0) * 100 / limit_cents, 1)
+            }
+            for category, limit_cents in sorted(limits.items())
+        ]
+    }
+
+@app.get("/api/budgets", response_model=BudgetsResponse)
+async def get_budgets(
+    current_user: dict = Depends(get_current_user),
+    loader: RequestLoader = Depends(get_loader)
+):
+    setup = await loader.load("user_setups", "user_id", current_user["user_id"])
+    return await budgets_response(current_user["user_id"], setup)
+
+@app.put("/api/budgets", response_model=BudgetsResponse)
+async def update_budgets(budgets: BudgetsUpdate, current_user: dict = Depends(get_current_user)):
+    if current_user.get("subscription_status") != "active":
+        raise HTTPException(status_code=403, detail="Active subscription required")
+    
+    try:
+        entries = [
+            {"category": category, "limit_cents": to_cents(limit)}
+            for category, limit in budgets.budgets.items()
+        ]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    setup = await db.user_setups.find_one_and_update(
+        {"user_id": current_user["user_id"]},
+        {"$set": {"budgets": entries, "updated_at": datetime.datetime.utcnow()}},
+        projection={"budgets": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if not setup:
+        raise HTTPException(status_code=400, detail="Please complete your financial setup first")
+    # Spending so far this month is checked against the new limits once
+    await reset_month_alerts(db, current_user["user_id"], current_month(), limits_from_setup(setup))
+    
+    return await budgets_response(current_user["user_id"], setup)
+
 # Expense management endpoints
 @app.post("/api/expenses")
 async def create_expense(expense: ExpenseCreate, current_user: dict = Depends(get_current_user)):
-    expense_data = {
-        "expense_id": str(uuid.uuid4()),
-        "user_id": current_user["user_id"],
-        "date": expense.date,
-        "category": expense.category,
-        "amount": expense.amount,
-        "payment_method": expense.payment_method,
-        "notes": expense.notes,
-        "created_at": datetime.datetime.utcnow()
-    }
+    try:
+        expense_data = new_expense_document(current_user["user_id"], expense.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     await db.expenses.insert_one(expense_data)
+    await apply_expenses(db, [expense_data])
     
     return {"message": "Expense created successfully", "expense_id": expense_data["expense_id"]}
 
-@app.get("/api/expenses")
-async def get_expenses(current_user: dict = Depends(get_current_user)):
-    expenses = await db.expenses.find({"user_id": current_user["user_id"]}).to_list(100)
-    
-    for expense in expenses:
-        expense["_id"] = str(expense["_id"])
-    
-    return {"expenses": expenses}
+# Rows per insert_many call for bulk ingestion
+BULK_BATCH_SIZE = int(os.environ.get('BULK_BATCH_SIZE', 1000))
 
-@app.post("/api/expenses/upload")
-async def upload_statement(file: UploadFile = File(...), current_user: dict = Depends(get_current_user)):
-    # Placeholder for PDF parsing
-    # In real implementation, you would integrate with OCR service
-    
-    # Create a placeholder transaction
-    expense_data = {
-        "expense_id": str(uuid.uuid4()),
-        "user_id": current_user["user_id"],
-        "date": datetime.datetime.utcnow().strftime("%Y-%m-%d"),
-        "category": "Statement Upload",
-        "amount": 0.00,
-        "payment_method": "Credit Card",
-        "notes": f"Uploaded statement: {file.filename}",
-        "created_at": datetime.datetime.utcnow(),
-        "source": "pdf_upload"
-    }
+# Statement parsing runs in a process pool, off the request path
+statement_importer = StatementImporter(
+    workers=int(os.environ.get('STATEMENT_WORKERS', 2)),
+    batch_size=BULK_BATCH_SIZE,
+)
+
+def describe_validation_error(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}"
+        for error in e.errors()
+    )
+
+async def iter_ndjson_rows(request: Request):
+    """Yield non-empty lines of an NDJSON body as it arrives."""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+@app.post("/api/expenses/bulk")
+async def bulk_create_expenses(
+    request: Request,
+    batch_size: int = Query(None, ge=1, le=10000),
+    current_user: dict = Depends(get_current_user)
+):
+    """Create many expenses from a JSON array or an NDJSON body (application/x-ndjson)."""
+    writer = ExpenseBatchWriter(db, current_user["user_id"], batch_size or BULK_BATCH_SIZE)
+    
+    async def ingest(row: int, raw: Any):
+        try:
+            expense = ExpenseCreate.model_validate(raw)
+        except ValidationError as e:
+            writer.reject(row, describe_validation_error(e))
+            return
+        await writer.add(row, expense.model_dump())
+    
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        row = 0
+        async for line in iter_ndjson_rows(request):
+            try:
+                raw = json.loads(line)
+            except ValueError:
+                writer.reject(row, "Invalid JSON")
+            else:
+                await ingest(row, raw)
+            row += 1
+    else:
+        try:
+            rows = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        for row, raw in enumerate(rows):
+            await ingest(row, raw)
+    
+    await writer.flush()
+    return writer.summary()
+
+# Fields shipped by the expense list view; notes are opt-in
+EXPENSE_LIST_FIELDS = ["expense_id", "date", "category", "payment_method"] + AMOUNT_FIELDS
+
+# Unset fields are left out: rows fetched without notes must not claim "notes": null
+@app.get("/api/expenses", response_model=ExpenseListResponse, response_model_exclude_unset=True)
+async def get_expenses(
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    start_date: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    end_date: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    category: Optional[str] = None,
+    payment_method: Optional[str] = None,
+    min_amount: Optional[float] = Query(None, allow_inf_nan=False),
+    max_amount: Optional[float] = Query(None, allow_inf_nan=False),
+    include_notes: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    query: Dict[str, Any] = {"user_id": current_user["user_id"]}
+    if category:
+        query["category"] = category
+    if payment_method:
+        query["payment_method"] = payment_method
+    if start_date or end_date:
+        try:
+            query["date"] = date_range(start_date, end_date)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date")
+    if min_amount is not None or max_amount is not None:
+        query["amount_cents"] = {}
+        try:
+            if min_amount is not None:
+                query["amount_cents"]["$gte"] = to_cents(min_amount)
+            if max_amount is not None:
+                query["amount_cents"]["$lte"] = to_cents(max_amount)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid amount")
+    
+    # Keyset pagination: resume strictly after the last (date, expense_id) seen
+    if cursor:
+        last_date, last_id = decode_cursor(cursor, 2)
+        try:
+            last_date = to_storage_date(last_date)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if not isinstance(last_id, str):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = {"$and": [query, descending_after(["date", "expense_id"], [last_date, last_id])]}
+    
+    projection = {field: 1 for field in EXPENSE_LIST_FIELDS}
+    projection["_id"] = 0
+    if include_notes:
+        projection["notes"] = 1
+    
+    expenses = await db.expenses.find(query, projection).sort(
+        [("date", -1), ("expense_id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    
+    next_cursor = None
+    if len(expenses) > limit:
+        expenses = expenses[:limit]
+        next_cursor = encode_cursor(date_string(expenses[-1]["date"]), expenses[-1]["expense_id"])
+    
+    return {"expenses": [to_api(expense) for expense in expenses], "next_cursor": next_cursor}
+
+@app.post("/api/expenses/upload", status_code=202)
+async def upload_statement(
+    file: UploadFile = File(...),
+    payment_method: str = Form("Credit Card"),
+    current_user: dict = Depends(get_current_user)
+):
+    if not is_supported(file.filename or ""):
+        raise HTTPException(status_code=400, detail="Upload a CSV, OFX/QFX, PDF or TXT statement")
     
-    await db.expenses.insert_one(expense_data)
+    try:
+        job = await statement_importer.create_job(db, current_user["user_id"], file, payment_method)
+    except StatementTooLarge:
+        raise HTTPException(status_code=413, detail="Statement file is too large")
     
     return {
-        "message": "Statement uploaded successfully. PDF parsing will be implemented soon.",
-        "filename": file.filename,
-        "expense_id": expense_data["expense_id"]
+        "message": "Statement uploaded successfully. Transactions are being imported.",
+        "filename": job["filename"],
+        "job_id": job["job_id"],
+        "status": job["status"]
     }
 
+@app.get("/api/expenses/upload/{job_id}")
+async def get_upload_status(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = await db.statement_jobs.find_one(
+        {"job_id": job_id, "user_id": current_user["user_id"]},
+        {"_id": 0, "user_id": 0}
+    )
+    if not job:
+        raise HTTPException(status_code=404, detail="Upload job not found")
+    
+    return job
+
 # LLM-powered features
+
+# Recommendations are reused while the user's financial inputs are unchanged
+recommendation_cache = RecommendationCache(
+    ttl=float(os.environ.get('RECOMMENDATION_TTL_SECONDS', 24 * 60 * 60))
+)
+recommendation_flights = SingleFlight()
+
+async def generate_recommendations(
+    providers: Providers, user_id: str, inputs: dict, inputs_fingerprint: str
+) -> str:
+    # Identical concurrent requests (and the precompute scheduler) share one LLM call
+    return await recommendation_flights.do(
+        (user_id, inputs_fingerprint),
+        lambda: generate_recommendation(db, providers.llm, user_id, inputs, inputs_fingerprint)
+    )
+
+# Regenerates recommendations of users whose finances changed, ahead of demand
+recommendation_scheduler = RecommendationScheduler(
+    recommendation_cache,
+    interval=float(os.environ.get('RECOMMENDATION_PRECOMPUTE_INTERVAL_SECONDS', 15 * 60)),
+    concurrency=int(os.environ.get('RECOMMENDATION_PRECOMPUTE_CONCURRENCY', 2)),
+    max_per_run=int(os.environ.get('RECOMMENDATION_PRECOMPUTE_MAX_PER_RUN', 100))
+)
+
+async def precompute_recommendation(user_id: str, inputs: dict, inputs_fingerprint: str) -> str:
+    return await generate_recommendations(app.state.providers, user_id, inputs, inputs_fingerprint)
+
 @app.post("/api/recommendations")
-async def get_financial_recommendations(current_user: dict = Depends(get_current_user)):
+async def get_financial_recommendations(
+    current_user: dict = Depends(get_current_user),
+    providers: Providers = Depends(get_providers),
+    loader: RequestLoader = Depends(get_loader)
+):
     # Get user's financial data
-    setup = await db.user_setups.find_one({"user_id": current_user["user_id"]})
-    expenses = await db.expenses.find({"user_id": current_user["user_id"]}).to_list(50)
+    setup, rollup = await asyncio.gather(
+        loader.load("user_setups", "user_id", current_user["user_id"]),
+        get_dashboard_rollup(db, current_user["user_id"], current_month())
+    )
     
     if not setup:
         raise HTTPException(status_code=400, detail="Please complete your financial setup first")
+    inputs = financial_inputs(setup, rollup["categories"])
+    inputs_fingerprint = fingerprint(inputs)
     
-    # Prepare data for LLM
-    total_expenses = sum(expense["amount"] for expense in expenses)
-    categories = {}
-    for expense in expenses:
-        category = expense["category"]
-        categories[category] = categories.get(category, 0) + expense["amount"]
-    
-    financial_summary = f"""
-    User Financial Profile:
-    - Cash Balance: ${setup.get('cash_balance', 0):.2f}
-    - Savings Balance: ${setup.get('savings_balance', 0):.2f}
-    - Bank Accounts: {', '.join(setup.get('bank_accounts', []))}
-    - Credit Cards: {', '.join(setup.get('credit_cards', []))}
-    - Total Monthly Expenses: ${total_expenses:.2f}
-    - Expense Categories: {categories}
-    
-    Please provide personalized financial recommendations including:
-    1. Areas where they can save money
-    2. Best credit card to use for rewards based on their spending
-    3. Where to invest excess cash for better returns
-    """
-    
-    # Initialize LLM chat
-    emergent_key = os.environ.get('EMERGENT_LLM_KEY')
-    if not emergent_key:
-        raise HTTPException(status_code=500, detail="LLM service not configured")
+    cached = await recommendation_cache.lookup(db, current_user["user_id"], inputs_fingerprint)
+    if cached:
+        return {"recommendations": cached["recommendations"], "cached": True}
     
-    chat = LlmChat(
-        api_key=emergent_key,
-        session_id=f"recommendations_{current_user['user_id']}",
-        system_message="You are a professional financial advisor. Provide practical, actionable advice."
-    ).with_model("openai", "gpt-4o-mini")
+    llm_rate_limiter.acquire(current_user["user_id"])
     
-    user_message = UserMessage(text=financial_summary)
-    response = await chat.send_message(user_message)
+    response = await generate_recommendations(providers, current_user["user_id"], inputs, inputs_fingerprint)
     
-    # Store recommendation
-    recommendation_data = {
-        "recommendation_id": str(uuid.uuid4()),
-        "user_id": current_user["user_id"],
-        "recommendations": response,
-        "created_at": datetime.datetime.utcnow()
-    }
-    
-    await db.recommendations.insert_one(recommendation_data)
-    
-    return {"recommendations": response}
+    return {"recommendations": response, "cached": False}
+
+ADVISOR_SYSTEM_MESSAGE = "You are a financial advisor AI assistant. Answer questions about investing, saving, budgeting, and personal finance. Provide practical advice."
+
+# Token budget for the context sent with each chat message: the rolling
+# summary plus as many recent turns as fit
+CHAT_CONTEXT_TOKENS = int(os.environ.get('CHAT_CONTEXT_TOKENS', 2000))
+CHAT_SUMMARY_TOKENS = int(os.environ.get('CHAT_SUMMARY_TOKENS', 400))
+
+async def prepare_chat_turn(user_id: str, message: ChatMessage):
+    conversation = await get_or_create_conversation(db, user_id, message.conversation_id, message.message)
+    prompt, needs_summary = await build_prompt(
+        db, conversation, message.message, CHAT_CONTEXT_TOKENS, CHAT_SUMMARY_TOKENS
+    )
+    return conversation["conversation_id"], prompt, needs_summary
 
 @app.post("/api/chat")
-async def chat_with_ai(message: ChatMessage, current_user: dict = Depends(get_current_user)):
-    emergent_key = os.environ.get('EMERGENT_LLM_KEY')
-    if not emergent_key:
-        raise HTTPException(status_code=500, detail="LLM service not configured")
-    
-    # Initialize LLM chat
-    chat = LlmChat(
-        api_key=emergent_key,
-        session_id=f"chat_{current_user['user_id']}",
-        system_message="You are a financial advisor AI assistant. Answer questions about investing, saving, budgeting, and personal finance. Provide practical advice."
-    ).with_model("openai", "gpt-4o-mini")
-    
-    user_message = UserMessage(text=message.message)
-    response = await chat.send_message(user_message)
+async def chat_with_ai(
+    message: ChatMessage,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user),
+    providers: Providers = Depends(get_providers)
+):
+    user_id = current_user["user_id"]
+    llm_rate_limiter.acquire(user_id)
+    conversation_id, prompt, needs_summary = await prepare_chat_turn(user_id, message)
+    
+    response = await providers.llm.send(
+        f"conversation_{conversation_id}", ADVISOR_SYSTEM_MESSAGE, prompt
+    )
     
     # Store chat message
-    chat_data = {
-        "chat_id": str(uuid.uuid4()),
-        "user_id": current_user["user_id"],
-        "message": message.message,
-        "response": response,
-        "created_at": datetime.datetime.utcnow()
-    }
+    chat_id = await record_turn(db, conversation_id, user_id, message.message, response)
+    if needs_summary:
+        background_tasks.add_task(
+            summarize_overflow, db, providers.llm, conversation_id, CHAT_CONTEXT_TOKENS, CHAT_SUMMARY_TOKENS
+        )
     
-    await db.chat_history.insert_one(chat_data)
+    return {"response": response, "conversation_id": conversation_id, "chat_id": chat_id}
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/api/chat/stream")
+async def chat_with_ai_stream(
+    message: ChatMessage,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user),
+    providers: Providers = Depends(get_providers)
+):
+    """Server-sent events variant of /api/chat: token events, then done."""
+    user_id = current_user["user_id"]
+    if not providers.llm.configured:
+        raise HTTPException(status_code=500, detail="LLM service not configured")
+    llm_rate_limiter.acquire(user_id)
+    # Shed load before the 200 response starts; after that errors are events
+    providers.llm.pool.check_admission()
+    conversation_id, prompt, needs_summary = await prepare_chat_turn(user_id, message)
+    
+    async def events():
+        parts = []
+        try:
+            async for delta in providers.llm.stream(f"conversation_{conversation_id}", ADVISOR_SYSTEM_MESSAGE, prompt):
+                parts.append(delta)
+                yield sse_event("token", {"delta": delta})
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+            return
+        
+        # Only completed replies are stored; a client that disconnects
+        # mid-stream cancels this generator before it gets here.
+        response = "".join(parts)
+        chat_id = await record_turn(db, conversation_id, user_id, message.message, response)
+        if needs_summary:
+            # Runs once the response body has been sent
+            background_tasks.add_task(
+                summarize_overflow, db, providers.llm, conversation_id, CHAT_CONTEXT_TOKENS, CHAT_SUMMARY_TOKENS
+            )
+        yield sse_event("done", {"chat_id": chat_id, "conversation_id": conversation_id})
     
-    return {"response": response}
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background_tasks
+    )
+
+def parse_cursor_datetime(value: Any) -> datetime.datetime:
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@app.get("/api/chat/conversations", response_model=ConversationListResponse)
+async def list_conversations(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    query = {"user_id": current_user["user_id"]}
+    if cursor:
+        updated_at, conversation_id = decode_cursor(cursor, 2)
+        query = {"$and": [query, descending_after(
+            ["updated_at", "conversation_id"], [parse_cursor_datetime(updated_at), conversation_id]
+        )]}
+    
+    conversations = await db.conversations.find(
+        query, {"_id": 0, "conversation_id": 1, "title": 1, "turn_count": 1, "created_at": 1, "updated_at": 1}
+    ).sort([("updated_at", -1), ("conversation_id", -1)]).limit(limit + 1).to_list(limit + 1)
+    
+    next_cursor = None
+    if len(conversations) > limit:
+        conversations = conversations[:limit]
+        last = conversations[-1]
+        next_cursor = encode_cursor(last["updated_at"].isoformat(), last["conversation_id"])
+    
+    return {"conversations": conversations, "next_cursor": next_cursor}
 
-@app.get("/api/chat/history")
-async def get_chat_history(current_user: dict = Depends(get_current_user)):
+@app.get("/api/chat/history", response_model=ChatHistoryResponse)
+async def get_chat_history(
+    conversation_id: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Newest-first turns, optionally of one conversation, one page at a time."""
+    query = {"user_id": current_user["user_id"]}
+    if conversation_id:
+        query["conversation_id"] = conversation_id
+    
+    # Keyset pagination: resume strictly after the last (created_at, chat_id) seen
+    if cursor:
+        created_at, chat_id = decode_cursor(cursor, 2)
+        query = {"$and": [query, descending_after(
+            ["created_at", "chat_id"], [parse_cursor_datetime(created_at), chat_id]
+        )]}
+    
     history = await db.chat_history.find(
-        {"user_id": current_user["user_id"]}
-    ).sort("created_at", -1).limit(20).to_list(20)
+        query, {"_id": 0, "user_id": 0}
+    ).sort([("created_at", -1), ("chat_id", -1)]).limit(limit + 1).to_list(limit + 1)
     
-    for item in history:
-        item["_id"] = str(item["_id"])
+    next_cursor = None
+    if len(history) > limit:
+        history = history[:limit]
+        next_cursor = encode_cursor(history[-1]["created_at"].isoformat(), history[-1]["chat_id"])
     
-    return {"history": history}
+    return {"history": history, "next_cursor": next_cursor}
 
 # Dashboard endpoints
-@app.get("/api/dashboard")
-async def get_dashboard_data(current_user: dict = Depends(get_current_user)):
-    # Get expenses
-    expenses = await db.expenses.find({"user_id": current_user["user_id"]}).to_list(100)
-    
-    # Calculate category breakdown
-    categories = {}
-    monthly_total = 0
-    
-    for expense in expenses:
-        category = expense["category"]
-        amount = expense["amount"]
-        categories[category] = categories.get(category, 0) + amount
-        monthly_total += amount
-    
-    # Get recent recommendations
-    recent_recommendations = await db.recommendations.find(
-        {"user_id": current_user["user_id"]}
-    ).sort("created_at", -1).limit(3).to_list(3)
-    
-    # Get user setup
-    setup = await db.user_setups.find_one({"user_id": current_user["user_id"]})
+@app.get("/api/dashboard", response_model=DashboardResponse)
+async def get_dashboard_data(
+    current_user: dict = Depends(get_current_user),
+    loader: RequestLoader = Depends(get_loader)
+):
+    # The reads are independent, so the page costs one round trip, not three.
+    # Month totals come from the incrementally maintained rollups.
+    month = current_month()
+    rollup, recent_recommendations, setup, alerts = await asyncio.gather(
+        get_dashboard_rollup(db, current_user["user_id"], month),
+        db.recommendations.find(
+            {"user_id": current_user["user_id"]}, {"_id": 0, "recommendations": 1}
+        ).sort("created_at", -1).limit(3).to_list(3),
+        loader.load("user_setups", "user_id", current_user["user_id"]),
+        db.budget_alerts.find(
+            {"user_id": current_user["user_id"], "month": month},
+            {"_id": 0, "category": 1, "threshold": 1, "spent_cents": 1, "limit_cents": 1}
+        ).sort([("category", 1), ("threshold", 1)]).to_list(None)
+    )
     
     return {
-        "monthly_expenses": monthly_total,
-        "category_breakdown": categories,
+        "monthly_expenses": rollup["month_total"],
+        "category_breakdown": rollup["categories"],
         "recent_recommendations": [r.get("recommendations", "") for r in recent_recommendations],
         "cash_balance": setup.get("cash_balance", 0) if setup else 0,
         "savings_balance": setup.get("savings_balance", 0) if setup else 0,
-        "total_expenses": len(expenses)
+        "total_expenses": rollup["lifetime_count"],
+        "budget_alerts": [
+            {
+                "category": alert["category"],
+                "threshold": alert["threshold"],
+                "spent": from_cents(alert["spent_cents"]),
+                "limit": from_cents(alert["limit_cents"])
+            }
+            for alert in alerts
+        ]
     }
 
+@app.get("/api/analytics")
+async def get_spending_analytics(
+    start_date: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    end_date: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    current_user: dict = Depends(get_current_user)
+):
+    # pandas takes longer to import than the rest of the app; only workers
+    # that serve analytics pay for it
+    from analytics import compute_analytics, load_expense_frame
+    
+    frame = await load_expense_frame(db, current_user["user_id"], start_date, end_date)
+    # pandas work is CPU bound; keep it off the event loop
+    analytics = await run_in_threadpool(compute_analytics, frame)
+    
+    # Already plain str/float/int values; skip jsonable_encoder
+    return ORJSONResponse({"start_date": start_date, "end_date": end_date, **analytics})
+
+# Rows fetched from Mongo per chunk of a streamed export
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+
 @app.get("/api/expenses/export")
-async def export_expenses(current_user: dict = Depends(get_current_user)):
-    expenses = await db.expenses.find({"user_id": current_user["user_id"]}).to_list(1000)
-    
-    # Create CSV data
-    csv_data = "Date,Category,Amount,Payment Method,Notes\n"
-    for expense in expenses:
-        csv_data += f"{expense['date']},{expense['category']},{expense['amount']},{expense['payment_method']},{expense.get('notes', '')}\n"
-    
-    return JSONResponse(
-        content={"csv_data": csv_data},
-        headers={"Content-Type": "application/json"}
-    )
+async def export_expenses(
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet)$"),
+    gzip: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=400, detail="Parquet export is not available")
+    
+    projection = {field: 1 for field in EXPORT_FIELDS + AMOUNT_FIELDS}
+    projection["_id"] = 0
+    cursor = db.expenses.find(
+        {"user_id": current_user["user_id"]}, projection, batch_size=EXPORT_BATCH_SIZE
+    ).sort([("date", 1), ("expense_id", 1)])
+    
+    body = EXPORTERS[format](cursor, EXPORT_BATCH_SIZE)
+    filename = f"expenses.{EXPORT_FORMATS[format]['extension']}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if gzip:
+        body = gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+    
+    return StreamingResponse(body, media_type=EXPORT_FORMATS[format]["media_type"], headers=headers)
+
+def component_stats() -> dict:
+    """Counters of the in-process caches, pools and queues."""
+    return {
+        "caches": {
+            "users": user_cache.stats(),
+            "recommendations": {**recommendation_cache.stats(), **recommendation_flights.stats()},
+            "checkout_status": {**checkout_status_cache.stats(), **checkout_status_flights.stats()}
+        },
+        "password_service": password_service.stats(),
+        "stripe_events": stripe_events.stats(),
+        "recommendation_scheduler": recommendation_scheduler.stats(),
+        "rate_limits": {"llm": llm_rate_limiter.stats()},
+        "upstreams": app.state.providers.stats()
+    }
+
+REGISTRY.register(StatsCollector(component_stats))
 
 @app.get("/api/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.datetime.utcnow()}
+    return {
+        "status": "healthy",
+        "timestamp": datetime.datetime.utcnow(),
+        **component_stats()
+    }
+
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness probe: only report ready when MongoDB answers a ping."""
+    try:
+        await asyncio.wait_for(client.admin.command("ping"), READY_TIMEOUT_SECONDS)
+    except Exception as e:
+        return ORJSONResponse(
+            status_code=503,
+            content={"status": "unavailable", "mongo": "unreachable", "detail": str(e) or type(e).__name__}
+        )
+    return {"status": "ready", "mongo": "ok"}
+
+@app.get("/api/metrics")
+async def metrics_endpoint():
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,403 @@
+"""Bank and card statement imports.
+
+An upload is copied to ``STATEMENT_UPLOAD_DIR`` in fixed-size chunks and a
+``statement_jobs`` record is returned straight away. Parsing is CPU bound, so
+it runs in a process pool; the resulting transactions are then written with
+``ExpenseBatchWriter`` while the job record tracks progress.
+
+Supported inputs are CSV exports, OFX/QFX files and PDFs or plain-text files
+whose text layer has one transaction per line.
+
+Jobs run as tasks of the worker that accepted the upload. A job left
+unfinished by a worker that stopped is marked failed, and its spooled file
+removed, when a worker starts and finds it untouched for
+``STATEMENT_JOB_STALE_SECONDS``.
+"""
+import asyncio
+import csv
+import datetime
+import logging
+import os
+import re
+import tempfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Set
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+
+from ingest import ExpenseBatchWriter
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = os.environ.get(
+    'STATEMENT_UPLOAD_DIR', os.path.join(tempfile.gettempdir(), "statement_uploads")
+)
+MAX_UPLOAD_BYTES = int(os.environ.get('STATEMENT_MAX_BYTES', 20 * 1024 * 1024))
+SPOOL_CHUNK_BYTES = 1024 * 1024
+# Room in the request body for the multipart boundaries and the other fields
+FORM_OVERHEAD_BYTES = 64 * 1024
+STALE_JOB_SECONDS = int(os.environ.get('STATEMENT_JOB_STALE_SECONDS', 600))
+IN_PROGRESS_STATUSES = ["queued", "parsing", "inserting"]
+
+DATE_FORMATS = ["%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%Y/%m/%d", "%d %b %Y", "%b %d, %Y", "%Y%m%d"]
+DATE_COLUMNS = ["date", "transaction date", "posted date", "posting date", "trans date"]
+AMOUNT_COLUMNS = ["amount", "transaction amount"]
+DEBIT_COLUMNS = ["debit", "withdrawal", "withdrawals"]
+DESCRIPTION_COLUMNS = ["description", "payee", "merchant", "name", "memo", "details"]
+CATEGORY_COLUMNS = ["category"]
+
+# "2024-01-15  COFFEE SHOP #12  -4.50" style lines from text-layer statements
+TEXT_LINE = re.compile(
+    r"^\s*(?P<date>\d{1,4}[/-]\d{1,2}(?:[/-]\d{2,4})?)\s+(?P<description>.+?)\s+"
+    r"(?P<amount>\(?-?\$?[\d,]+\.\d{2}\)?)\s*$"
+)
+OFX_TRANSACTION = re.compile(r"<STMTTRN>(.*?)(?:</STMTTRN>|(?=<STMTTRN>)|</BANKTRANLIST>)", re.S | re.I)
+OFX_FIELD = re.compile(r"<(?P<tag>[A-Z]+)>(?P<value>[^<\r\n]*)", re.I)
+
+
+class StatementTooLarge(Exception):
+    pass
+
+
+def parse_date(value: str) -> Optional[str]:
+    value = value.strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, date_format).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+def parse_amount(value: str) -> Optional[float]:
+    value = value.strip().replace("$", "").replace(",", "")
+    negative = value.startswith("(") and value.endswith(")")
+    value = value.strip("()")
+    if not value:
+        return None
+    try:
+        amount = float(value)
+    except ValueError:
+        return None
+    return -amount if negative else amount
+
+
+def as_expenses(transactions: List[dict]) -> List[dict]:
+    """Keep the spending side of signed transactions as positive amounts.
+
+    Bank exports show spending as negative amounts and deposits as positive;
+    card exports usually show purchases as positive. If a file has any
+    negative amounts it is treated as the former.
+    """
+    signed = any(t["amount"] < 0 for t in transactions)
+    expenses = []
+    for transaction in transactions:
+        amount = transaction["amount"]
+        if signed:
+            if amount >= 0:
+                continue
+            amount = -amount
+        elif amount <= 0:
+            continue
+        expenses.append({**transaction, "amount": round(amount, 2)})
+    return expenses
+
+
+def _column(fieldnames: Sequence[str], candidates: List[str]) -> Optional[str]:
+    normalized = {name.strip().lower(): name for name in fieldnames if name}
+    for candidate in candidates:
+        if candidate in normalized:
+            return normalized[candidate]
+    return None
+
+
+def parse_csv(path: str) -> List[dict]:
+    with open(path, newline="", encoding="utf-8-sig", errors="replace") as f:
+        reader = csv.DictReader(f)
+        fieldnames = reader.fieldnames or []
+        date_column = _column(fieldnames, DATE_COLUMNS)
+        amount_column = _column(fieldnames, AMOUNT_COLUMNS)
+        debit_column = _column(fieldnames, DEBIT_COLUMNS)
+        description_column = _column(fieldnames, DESCRIPTION_COLUMNS)
+        category_column = _column(fieldnames, CATEGORY_COLUMNS)
+        if not date_column or not (amount_column or debit_column):
+            raise ValueError("CSV statement needs a date column and an amount or debit column")
+
+        transactions = []
+        for row in reader:
+            date = parse_date(row.get(date_column) or "")
+            if debit_column and (row.get(debit_column) or "").strip():
+                # Separate debit column: every value is spending
+                amount = parse_amount(row[debit_column])
+                amount = -abs(amount) if amount is not None else None
+            elif amount_column:
+                amount = parse_amount(row.get(amount_column) or "")
+            else:
+                amount = None
+            if date is None or amount is None:
+                continue
+            transactions.append({
+                "date": date,
+                "amount": amount,
+                "description": (row.get(description_column) or "").strip() if description_column else "",
+                "category": (row.get(category_column) or "").strip() if category_column else "",
+            })
+    return transactions
+
+
+def parse_ofx(path: str) -> List[dict]:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        content = f.read()
+
+    transactions = []
+    for block in OFX_TRANSACTION.findall(content):
+        fields = {m.group("tag").upper(): m.group("value").strip() for m in OFX_FIELD.finditer(block)}
+        date = parse_date(fields.get("DTPOSTED", "")[:8])
+        amount = parse_amount(fields.get("TRNAMT", ""))
+        if date is None or amount is None:
+            continue
+        transactions.append({
+            "date": date,
+            "amount": amount,
+            "description": fields.get("NAME") or fields.get("MEMO") or "",
+            "category": "",
+        })
+    return transactions
+
+
+def parse_text_lines(lines) -> List[dict]:
+    transactions = []
+    for line in lines:
+        match = TEXT_LINE.match(line)
+        if not match:
+            continue
+        date = parse_date(match.group("date"))
+        amount = parse_amount(match.group("amount"))
+        if date is None or amount is None:
+            continue
+        transactions.append({
+            "date": date,
+            "amount": amount,
+            "description": match.group("description").strip(),
+            "category": "",
+        })
+    return transactions
+
+
+def parse_pdf(path: str) -> List[dict]:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise ValueError("PDF statements require the pypdf package")
+
+    reader = PdfReader(path)
+    lines = []
+    for page in reader.pages:
+        lines.extend((page.extract_text() or "").splitlines())
+    if not lines:
+        raise ValueError("PDF has no text layer; scanned statements are not supported")
+    return parse_text_lines(lines)
+
+
+def parse_text(path: str) -> List[dict]:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return parse_text_lines(f)
+
+
+PARSERS = {
+    ".csv": parse_csv,
+    ".ofx": parse_ofx,
+    ".qfx": parse_ofx,
+    ".pdf": parse_pdf,
+    ".txt": parse_text,
+}
+
+
+def is_supported(filename: str) -> bool:
+    return os.path.splitext(filename.lower())[1] in PARSERS
+
+
+def parse_statement(path: str, filename: str) -> List[dict]:
+    """Parse a spooled statement into expense fields. Runs in a worker process."""
+    extension = os.path.splitext(filename.lower())[1]
+    parser = PARSERS.get(extension)
+    if parser is None:
+        raise ValueError(f"Unsupported statement type: {extension or filename}")
+    return as_expenses(parser(path))
+
+
+def spool_upload(source, destination: str) -> int:
+    """Copy an uploaded file object to disk in chunks; returns the size."""
+    size = 0
+    with open(destination, "wb") as out:
+        while True:
+            chunk = source.read(SPOOL_CHUNK_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise StatementTooLarge()
+            out.write(chunk)
+    return size
+
+
+class UploadSizeLimit:
+    """ASGI middleware capping the request body of the statement upload.
+
+    Starlette reads a multipart body in full before the endpoint runs, so the
+    limit has to hold while the body is received: a declared Content-Length
+    over it is refused straight away, and a chunked body is cut off once it
+    passes it.
+    """
+
+    def __init__(self, app, path: str, max_bytes: int = MAX_UPLOAD_BYTES + FORM_OVERHEAD_BYTES):
+        self.app = app
+        self.path = path
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        declared = Headers(scope=scope).get("content-length", "")
+        if declared.isdigit() and int(declared) > self.max_bytes:
+            response = JSONResponse({"detail": "Statement file is too large"}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail="Statement file is too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+class StatementImporter:
+    """Runs statement jobs in the background of the web worker."""
+
+    def __init__(self, workers: int, batch_size: int):
+        self.workers = workers
+        self.batch_size = batch_size
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def submit(self, db, job: dict, path: str, payment_method: str) -> None:
+        task = asyncio.create_task(self._run(db, job, path, payment_method))
+        # Keep a reference so the task is not garbage collected mid-run
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _update(self, db, job_id: str, **fields) -> None:
+        fields["updated_at"] = datetime.datetime.utcnow()
+        await db.statement_jobs.update_one({"job_id": job_id}, {"$set": fields})
+
+    async def _run(self, db, job: dict, path: str, payment_method: str) -> None:
+        job_id = job["job_id"]
+        try:
+            await self._update(db, job_id, status="parsing")
+            loop = asyncio.get_running_loop()
+            transactions = await loop.run_in_executor(
+                self._executor(), parse_statement, path, job["filename"]
+            )
+            await self._update(db, job_id, status="inserting", rows_parsed=len(transactions))
+
+            writer = ExpenseBatchWriter(
+                db, job["user_id"], self.batch_size, keep_results=False,
+                source="statement_upload", statement_job_id=job_id,
+            )
+            for start in range(0, len(transactions), self.batch_size):
+                for row, transaction in enumerate(transactions[start:start + self.batch_size], start):
+                    await writer.add(row, {
+                        "date": transaction["date"],
+                        "category": transaction["category"] or "Uncategorized",
+                        "amount": transaction["amount"],
+                        "payment_method": payment_method,
+                        "notes": transaction["description"] or None,
+                    })
+                await writer.flush()
+                await self._update(db, job_id, rows_inserted=writer.inserted, rows_failed=writer.failed)
+
+            await self._update(db, job_id, status="completed")
+        except Exception as e:
+            logger.exception("Statement job %s failed", job_id)
+            await self._update(db, job_id, status="failed", error=str(e))
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    async def create_job(self, db, user_id: str, upload, payment_method: str) -> dict:
+        """Spool ``upload`` to disk, record a queued job and start it."""
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        job_id = str(uuid.uuid4())
+        path = os.path.join(UPLOAD_DIR, job_id)
+        try:
+            size = await run_in_threadpool(spool_upload, upload.file, path)
+        except BaseException:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+
+        now = datetime.datetime.utcnow()
+        job = {
+            "job_id": job_id,
+            "user_id": user_id,
+            "filename": upload.filename or "statement",
+            "size_bytes": size,
+            "status": "queued",
+            "rows_parsed": 0,
+            "rows_inserted": 0,
+            "rows_failed": 0,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await db.statement_jobs.insert_one(dict(job))
+        self.submit(db, job, path, payment_method)
+        return job
+
+    async def fail_stale_jobs(self, db) -> int:
+        """Fail jobs no worker has advanced for ``STALE_JOB_SECONDS``; returns how many.
+
+        Called at startup: such jobs belonged to a worker that has stopped.
+        The staleness cutoff leaves the running jobs of other workers alone.
+        """
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=STALE_JOB_SECONDS)
+        stale = {"status": {"$in": IN_PROGRESS_STATUSES}, "updated_at": {"$lt": cutoff}}
+        failed = 0
+        async for job in db.statement_jobs.find(stale, {"_id": 0, "job_id": 1}):
+            # Conditional on still being stale, in case the job moved meanwhile
+            result = await db.statement_jobs.update_one(
+                {"job_id": job["job_id"], **stale},
+                {"$set": {"status": "failed", "error": "Import was interrupted, please upload the statement again",
+                          "updated_at": datetime.datetime.utcnow()}},
+            )
+            failed += result.modified_count
+            try:
+                os.remove(os.path.join(UPLOAD_DIR, job["job_id"]))
+            except OSError:
+                pass
+        return failed
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
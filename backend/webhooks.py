@@ -0,0 +1,160 @@
+"""Deduplicated, queue-backed processing of Stripe webhook events.
+
+The webhook handler only verifies the event and records its ID in
+``stripe_events``, whose unique index turns a redelivery into a single failed
+insert, then acknowledges. The payment state transition is applied by a
+background worker with one ``find_one_and_update``. An event whose update
+fails (e.g. a transient MongoDB error) is retried in process with
+exponential backoff, since Stripe has already been acknowledged and will not
+redeliver it; events still unprocessed when the process stopped are
+re-enqueued on the next start.
+"""
+import asyncio
+import datetime
+import logging
+from typing import Any, Callable, Optional, Set
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Backoff between in-process retries of a failed event: 1s, 2s, 4s ... 5 min
+RETRY_BASE_SECONDS = 1.0
+RETRY_MAX_SECONDS = 300.0
+
+
+class StripeEventQueue:
+    def __init__(self, on_activated: Optional[Callable[[str], None]] = None):
+        # Called with the user_id of every newly activated subscription
+        self.on_activated = on_activated
+        self.received = 0
+        self.duplicates = 0
+        self.processed = 0
+        self.failed = 0
+        self.retried = 0
+        self._db: Any = None
+        self._retries: Set[asyncio.TimerHandle] = set()
+        # Replaced by start(); a queue binds to the loop that first uses it
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+
+    async def start(self, db) -> None:
+        """Start the worker and re-enqueue events left unprocessed."""
+        self._db = db
+        self._queue = asyncio.Queue()
+        pending = db.stripe_events.find(
+            {"processed": False}, {"_id": 0}
+        ).sort("received_at", 1)
+        async for event in pending:
+            # May have been partly applied before the stop
+            self._queue.put_nowait({**event, "attempt": 1})
+        self._worker = asyncio.create_task(self._work())
+
+    async def stop(self) -> None:
+        for handle in self._retries:
+            handle.cancel()
+        self._retries.clear()
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def record(self, db, webhook_response) -> bool:
+        """Record a verified event; False if it was already delivered."""
+        session_id = webhook_response.session_id
+        event_id = getattr(webhook_response, "event_id", None) or f"{session_id}:{webhook_response.payment_status}"
+        event = {
+            "event_id": event_id,
+            "event_type": getattr(webhook_response, "event_type", None),
+            "session_id": session_id,
+            "payment_status": webhook_response.payment_status,
+            "processed": False,
+            "received_at": datetime.datetime.utcnow(),
+        }
+        try:
+            await db.stripe_events.insert_one(dict(event))
+        except DuplicateKeyError:
+            self.duplicates += 1
+            return False
+        self.received += 1
+        self._queue.put_nowait(event)
+        return True
+
+    async def _work(self) -> None:
+        while True:
+            event = await self._queue.get()
+            try:
+                await self._apply(event)
+                self.processed += 1
+            except Exception:
+                self.failed += 1
+                logger.exception("Could not apply Stripe event %s", event["event_id"])
+                self._retry_later(event)
+            finally:
+                self._queue.task_done()
+
+    def _retry_later(self, event: dict) -> None:
+        attempt = event.get("attempt", 0)
+        event = {**event, "attempt": attempt + 1}
+        delay = min(RETRY_BASE_SECONDS * 2 ** attempt, RETRY_MAX_SECONDS)
+
+        def enqueue():
+            self._retries.discard(handle)
+            self.retried += 1
+            self._queue.put_nowait(event)
+
+        handle = asyncio.get_running_loop().call_later(delay, enqueue)
+        self._retries.add(handle)
+
+    async def _apply(self, event: dict) -> None:
+        db = self._db
+        if event["payment_status"] == "paid":
+            # Only the first transition to paid matches, so the user update
+            # happens once however many events report the same payment.
+            transaction = await db.payment_transactions.find_one_and_update(
+                {"session_id": event["session_id"], "payment_status": {"$ne": "paid"}},
+                {"$set": {
+                    "payment_status": "paid",
+                    "status": "completed",
+                    "updated_at": datetime.datetime.utcnow()
+                }},
+                projection={"user_id": 1},
+                return_document=ReturnDocument.AFTER,
+            )
+            if transaction is None and event.get("attempt"):
+                # A failed earlier attempt may have marked the transaction
+                # paid without activating the user; activation is idempotent
+                transaction = await db.payment_transactions.find_one(
+                    {"session_id": event["session_id"], "payment_status": "paid"}, {"user_id": 1}
+                )
+            if transaction:
+                await db.users.update_one(
+                    {"user_id": transaction["user_id"]},
+                    {"$set": {"subscription_status": "active"}}
+                )
+                if self.on_activated is not None:
+                    self.on_activated(transaction["user_id"])
+
+        await db.stripe_events.update_one(
+            {"event_id": event["event_id"]},
+            {"$set": {"processed": True, "processed_at": datetime.datetime.utcnow()}}
+        )
+
+    async def drain(self) -> None:
+        """Wait until every queued event has been applied."""
+        await self._queue.join()
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "processed": self.processed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "retries_pending": len(self._retries),
+            "queued": self._queue.qsize(),
+        }
@@ -10,6 +10,7 @@ const ChatPage = ({ user }) => {
   const [currentMessage, setCurrentMessage] = useState('');
   const [loading, setLoading] = useState(false);
   const [chatHistory, setChatHistory] = useState([]);
+  const [conversationId, setConversationId] = useState(null);
   const [hasFinancialProfile, setHasFinancialProfile] = useState(true);
   const messagesEndRef = useRef(null);
 
@@ -84,29 +85,54 @@ const ChatPage = ({ user }) => {
 
     try {
       const token = localStorage.getItem('token');
-      const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/chat`, {
+      const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/chat/stream`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
           'Authorization': `Bearer ${token}`,
         },
-        body: JSON.stringify({ message: userMessage }),
+        body: JSON.stringify({ message: userMessage, conversation_id: conversationId }),
       });
 
       if (!response.ok) {
         throw new Error('Failed to get response');
       }
 
-      const data = await response.json();
-
-      // Add AI response to UI
-      const aiMessage = {
-        id: Date.now() + 1,
+      // Show the AI response as it streams in
+      const aiMessageId = Date.now() + 1;
+      setMessages(prev => [...prev, {
+        id: aiMessageId,
         type: 'assistant',
-        content: data.response,
+        content: '',
         timestamp: new Date()
+      }]);
+      const appendToAiMessage = (delta) => {
+        setMessages(prev => prev.map(msg =>
+          msg.id === aiMessageId ? { ...msg, content: msg.content + delta } : msg
+        ));
       };
-      setMessages(prev => [...prev, aiMessage]);
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        for (const rawEvent of events) {
+          const eventName = rawEvent.match(/^event: (.*)$/m)?.[1];
+          const data = JSON.parse(rawEvent.match(/^data: (.*)$/m)?.[1] || '{}');
+          if (eventName === 'token') {
+            appendToAiMessage(data.delta);
+          } else if (eventName === 'done') {
+            setConversationId(data.conversation_id);
+          } else if (eventName === 'error') {
+            throw new Error(data.detail || 'Failed to get response');
+          }
+        }
+      }
 
       // Refresh chat history
       fetchChatHistory();
@@ -128,6 +154,8 @@ const ChatPage = ({ user }) => {
 
   const clearChat = () => {
     setMessages([]);
+    // The next message starts a new conversation
+    setConversationId(null);
   };
 
   const loadHistoryMessage = (historyItem) => {
@@ -12,7 +12,8 @@ import {
   Plus,
   Lightbulb,
   MessageCircle,
-  ArrowRight
+  ArrowRight,
+  AlertTriangle
 } from 'lucide-react';
 
 const Dashboard = ({ user }) => {
@@ -59,10 +60,8 @@ const Dashboard = ({ user }) => {
         throw new Error('Failed to export data');
       }
 
-      const data = await response.json();
-      
-      // Create and download CSV file
-      const blob = new Blob([data.csv_data], { type: 'text/csv' });
+      // Download the streamed CSV file
+      const blob = await response.blob();
       const url = window.URL.createObjectURL(blob);
       const a = document.createElement('a');
       a.style.display = 'none';
@@ -205,6 +204,28 @@ const Dashboard = ({ user }) => {
         </Card>
       </div>
 
+      {/* Budget Alerts */}
+      {dashboardData?.budget_alerts?.length > 0 && (
+        <Card className="glass p-6 mb-8">
+          <h3 className="text-lg font-semibold text-gray-900 mb-4">Budget Alerts</h3>
+          <div className="space-y-3">
+            {dashboardData.budget_alerts.map((alert) => (
+              <div
+                key={`${alert.category}-${alert.threshold}`}
+                className={`flex items-center p-3 rounded-lg border ${
+                  alert.threshold >= 100 ? 'bg-red-50 border-red-100' : 'bg-yellow-50 border-yellow-100'
+                }`}
+              >
+                <AlertTriangle className={`w-5 h-5 mr-3 ${alert.threshold >= 100 ? 'text-red-600' : 'text-yellow-600'}`} />
+                <p className="text-sm text-gray-700">
+                  {alert.category}: ${alert.spent.toFixed(2)} spent, {alert.threshold}% of the ${alert.limit.toFixed(2)} monthly budget
+                </p>
+              </div>
+            ))}
+          </div>
+        </Card>
+      )}
+
       {/* Charts Section */}
       <div className="grid grid-cols-1 lg:grid-cols-2 gap-8 mb-8">
         {/* Expense Breakdown Pie Chart */}
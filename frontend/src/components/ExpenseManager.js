@@ -18,9 +18,13 @@ import {
   Edit
 } from 'lucide-react';
 
+const UPLOAD_POLL_TIMEOUT_MS = 10 * 60 * 1000;
+
 const ExpenseManager = ({ user }) => {
   const [expenses, setExpenses] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [submitting, setSubmitting] = useState(false);
   const [error, setError] = useState('');
   const [success, setSuccess] = useState('');
@@ -59,10 +63,15 @@ const ExpenseManager = ({ user }) => {
     fetchExpenses();
   }, []);
 
-  const fetchExpenses = async () => {
+  // Without a cursor this reloads the first page; with one it appends the next page
+  const fetchExpenses = async (cursor = null) => {
     try {
       const token = localStorage.getItem('token');
-      const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/expenses`, {
+      const params = new URLSearchParams({ include_notes: 'true' });
+      if (cursor) {
+        params.set('cursor', cursor);
+      }
+      const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/expenses?${params}`, {
         headers: {
           'Authorization': `Bearer ${token}`,
         },
@@ -73,7 +82,9 @@ const ExpenseManager = ({ user }) => {
       }
 
       const data = await response.json();
-      setExpenses(data.expenses || []);
+      const page = data.expenses || [];
+      setExpenses(cursor ? (current) => [...current, ...page] : page);
+      setNextCursor(data.next_cursor || null);
     } catch (error) {
       setError(error.message);
     } finally {
@@ -81,6 +92,12 @@ const ExpenseManager = ({ user }) => {
     }
   };
 
+  const loadMoreExpenses = async () => {
+    setLoadingMore(true);
+    await fetchExpenses(nextCursor);
+    setLoadingMore(false);
+  };
+
   const handleAddExpense = async (e) => {
     e.preventDefault();
     setSubmitting(true);
@@ -154,6 +171,11 @@ const ExpenseManager = ({ user }) => {
       }
 
       setSuccess(data.message);
+      const job = await waitForUploadJob(data.job_id, token);
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Failed to import statement');
+      }
+      setSuccess(`Imported ${job.rows_inserted} transactions from ${job.filename}`);
       fetchExpenses();
 
     } catch (error) {
@@ -163,6 +185,27 @@ const ExpenseManager = ({ user }) => {
     }
   };
 
+  const waitForUploadJob = async (jobId, token) => {
+    // Poll every second at first, backing off to every 10 seconds, for at most ~10 minutes
+    let delay = 1000;
+    for (let elapsed = 0; elapsed < UPLOAD_POLL_TIMEOUT_MS; elapsed += delay, delay = Math.min(delay * 1.5, 10000)) {
+      await new Promise((resolve) => setTimeout(resolve, delay));
+      const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/expenses/upload/${jobId}`, {
+        headers: {
+          'Authorization': `Bearer ${token}`,
+        },
+      });
+      const job = await response.json();
+      if (!response.ok) {
+        throw new Error(job.detail || 'Failed to check upload status');
+      }
+      if (job.status === 'completed' || job.status === 'failed') {
+        return job;
+      }
+    }
+    throw new Error('The statement is still being imported. Check your expenses again in a few minutes.');
+  };
+
   const formatDate = (dateString) => {
     return new Date(dateString).toLocaleDateString();
   };
@@ -359,7 +402,7 @@ const ExpenseManager = ({ user }) => {
                     </p>
                     <input
                       type="file"
-                      accept=".pdf"
+                      accept=".pdf,.csv,.ofx,.qfx,.txt"
                       onChange={handleFileUpload}
                       className="hidden"
                       id="file-upload"
@@ -392,8 +435,8 @@ const ExpenseManager = ({ user }) => {
                   
                   <div className="mt-4 p-4 bg-blue-50 rounded-lg">
                     <p className="text-xs text-blue-700">
-                      <strong>Note:</strong> PDF parsing is currently in development. 
-                      Uploaded files will create placeholder entries for now.
+                      <strong>Note:</strong> CSV, OFX/QFX and text-based PDF statements are supported.
+                      Scanned PDFs without a text layer cannot be imported.
                     </p>
                   </div>
                 </div>
@@ -464,6 +507,16 @@ const ExpenseManager = ({ user }) => {
                     </div>
                   </div>
                 ))}
+                {nextCursor && (
+                  <Button
+                    variant="outline"
+                    className="w-full"
+                    onClick={loadMoreExpenses}
+                    disabled={loadingMore}
+                  >
+                    {loadingMore ? 'Loading...' : 'Load more'}
+                  </Button>
+                )}
               </div>
             )}
           </Card>
@@ -4,6 +4,8 @@ import { Card } from './ui/card';
 import { Button } from './ui/button';
 import { CheckCircle, Crown, Zap, Shield, TrendingUp } from 'lucide-react';
 
+const MAX_STATUS_POLLS = 10;
+
 const SubscriptionPage = ({ user, success = false, cancelled = false }) => {
   const navigate = useNavigate();
   const [isLoading, setIsLoading] = useState(false);
@@ -16,7 +18,7 @@ const SubscriptionPage = ({ user, success = false, cancelled = false }) => {
     }
   }, [success]);
 
-  const checkPaymentStatus = async () => {
+  const checkPaymentStatus = async (attempt = 0) => {
     const urlParams = new URLSearchParams(window.location.search);
     const sessionId = urlParams.get('session_id');
     
@@ -43,6 +45,9 @@ const SubscriptionPage = ({ user, success = false, cancelled = false }) => {
         setTimeout(() => {
           navigate('/setup');
         }, 3000);
+      } else if (data.poll_interval && attempt < MAX_STATUS_POLLS) {
+        // Still pending; poll again at the interval the server suggests
+        setTimeout(() => checkPaymentStatus(attempt + 1), data.poll_interval * 1000);
       }
     } catch (error) {
       console.error('Error checking payment status:', error);
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from budgets import crossed_thresholds, limits_from_setup, record_crossings
+from indexes import INDEXES
+
+
+@pytest.mark.parametrize("before,after,expected", [
+    (0, 7999, []),
+    (0, 8000, [80]),
+    (7999, 8000, [80]),
+    (8000, 9999, []),
+    (7000, 10000, [80, 100]),
+    (10000, 12000, []),
+    (9000, 8000, []),
+])
+def test_crossed_thresholds(before, after, expected):
+    assert crossed_thresholds(before, after, limit_cents=10000) == expected
+
+
+def test_crossed_thresholds_rounds_nothing():
+    # 80% of 333 cents is 266.4: 266 has not reached it, 267 has
+    assert crossed_thresholds(0, 266, 333) == []
+    assert crossed_thresholds(266, 267, 333) == [80]
+
+
+def test_record_crossings_alerts_once():
+    db = AsyncMongoMockClient()["budgets"]
+
+    async def scenario():
+        await db.budget_alerts.create_indexes(INDEXES["budget_alerts"])
+        limits = {"Food": 10000}
+        first = await record_crossings(db, "u", "2024-03", [("Food", 0, 8500), ("Rent", 0, 10 ** 6)], limits)
+        # A concurrent write crossing the same line does not alert again
+        again = await record_crossings(db, "u", "2024-03", [("Food", 7900, 10100)], limits)
+        alerts = await db.budget_alerts.find({}, {"_id": 0, "threshold": 1}).sort("threshold", 1).to_list(None)
+        return first, again, alerts
+
+    first, again, alerts = asyncio.run(scenario())
+
+    assert (first, again) == (1, 1)
+    assert alerts == [{"threshold": 80}, {"threshold": 100}]
+
+
+def test_zero_limits_are_ignored():
+    setup = {"budgets": [{"category": "Food", "limit_cents": 10000}, {"category": "Fun", "limit_cents": 0}]}
+
+    assert limits_from_setup(setup) == {"Food": 10000}
+    assert limits_from_setup(None) == {}
@@ -0,0 +1,70 @@
+import asyncio
+import datetime
+
+from mongomock_motor import AsyncMongoMockClient
+
+from conversations import MAX_CONTEXT_TURNS, build_prompt, summarize_overflow
+
+
+class RecordingLLM:
+    def __init__(self):
+        self.prompts = []
+
+    async def send(self, session_id, system_message, text):
+        self.prompts.append(text)
+        return f"summary {len(self.prompts)}"
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def seed(db, count):
+    start = datetime.datetime(2024, 3, 1)
+    run(db.conversations.insert_one({"conversation_id": "c", "summary": "", "summarized_until": None}))
+    run(db.chat_history.insert_many([
+        {"chat_id": f"t{index:03}", "conversation_id": "c", "message": f"m{index}", "response": "ok",
+         "created_at": start + datetime.timedelta(minutes=index)}
+        for index in range(count)
+    ]))
+
+
+def test_short_turns_past_the_cap_are_summarized():
+    db = AsyncMongoMockClient()["conversations"]
+    seed(db, MAX_CONTEXT_TURNS + 10)
+    conversation = run(db.conversations.find_one({"conversation_id": "c"}))
+
+    _, needs_summary = run(build_prompt(db, conversation, "hi", budget=100_000, summary_tokens=100))
+    assert needs_summary
+
+    llm = RecordingLLM()
+    run(summarize_overflow(db, llm, "c", budget=100_000, summary_tokens=100))
+
+    assert len(llm.prompts) == 1
+    # The turns beyond the 50 read are folded in too
+    assert "User: m0\n" in llm.prompts[0]
+    kept = MAX_CONTEXT_TURNS // 2
+    last_folded = MAX_CONTEXT_TURNS + 10 - kept - 1
+    assert f"User: m{last_folded}\n" in llm.prompts[0]
+    assert f"User: m{last_folded + 1}\n" not in llm.prompts[0]
+    conversation = run(db.conversations.find_one({"conversation_id": "c"}))
+    assert conversation["summarized_until"] == datetime.datetime(2024, 3, 1) + datetime.timedelta(minutes=last_folded)
+
+    _, needs_summary = run(build_prompt(db, conversation, "hi", budget=100_000, summary_tokens=100))
+    assert not needs_summary
+
+
+def test_long_backlog_is_folded_in_chunks():
+    db = AsyncMongoMockClient()["conversations"]
+    seed(db, 10)
+    llm = RecordingLLM()
+
+    # Each turn costs 6 tokens: one stays in context, nine are folded two at a time
+    run(summarize_overflow(db, llm, "c", budget=12, summary_tokens=1))
+
+    assert len(llm.prompts) == 5
+    assert "User: m0\n" in llm.prompts[0]
+    assert "Current summary:\nsumm\n" in llm.prompts[1]
+    assert "User: m8\n" in llm.prompts[-1]
+    conversation = run(db.conversations.find_one({"conversation_id": "c"}))
+    assert conversation["summarized_until"] == datetime.datetime(2024, 3, 1, 0, 8)
@@ -0,0 +1,30 @@
+import datetime
+
+import pytest
+
+from expense_schema import to_cents, to_storage_date
+
+
+@pytest.mark.parametrize("amount,cents", [(12.5, 1250), ("0.005", 1), (-0.005, -1), (0.1 + 0.2, 30)])
+def test_to_cents(amount, cents):
+    assert to_cents(amount) == cents
+
+
+@pytest.mark.parametrize("amount", [float("nan"), float("inf"), "-Infinity", 1e30, "abc"])
+def test_to_cents_rejects_unstorable_amounts(amount):
+    with pytest.raises(ValueError):
+        to_cents(amount)
+
+
+def test_to_storage_date():
+    midnight = datetime.datetime(2024, 3, 5)
+
+    assert to_storage_date("2024-03-05") == midnight
+    assert to_storage_date(datetime.date(2024, 3, 5)) == midnight
+    assert to_storage_date(datetime.datetime(2024, 3, 5, 13, 30)) == midnight
+
+
+@pytest.mark.parametrize("value,error", [("2024-13-05", ValueError), (1, TypeError), (None, TypeError), ([], TypeError)])
+def test_to_storage_date_rejects(value, error):
+    with pytest.raises(error):
+        to_storage_date(value)
@@ -0,0 +1,121 @@
+import asyncio
+import datetime
+from types import SimpleNamespace
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import manage
+from manage import EXPENSES_MIGRATION_ID, migrate_expenses
+
+
+@pytest.fixture
+def db(monkeypatch):
+    # mongomock has no $substrBytes; rollups are covered by their own rebuild
+    async def rebuild_rollups(db, user_id=None):
+        return 0
+
+    monkeypatch.setattr(manage, "rebuild_rollups", rebuild_rollups)
+    return AsyncMongoMockClient()["migrate_expenses"]
+
+
+def legacy(index, date="2024-03-05", amount=12.5):
+    return {"_id": index, "expense_id": f"e{index}", "user_id": "u", "date": date, "amount": amount}
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_rewrites_legacy_fields(db):
+    run(db.expenses.insert_many([legacy(1), legacy(2, "2024-12-31", 0.1)]))
+
+    result = run(migrate_expenses(db, batch_size=10, restart=False))
+
+    assert result == {"migrated": 2, "failed": 0, "rollups": 0}
+    expense = run(db.expenses.find_one({"_id": 2}))
+    assert expense["date"] == datetime.datetime(2024, 12, 31)
+    assert expense["month"] == "2024-12"
+    assert expense["amount_cents"] == 10
+    assert "amount" not in expense
+
+
+def test_typed_documents_are_left_alone(db):
+    run(db.expenses.insert_many([legacy(1)]))
+    run(migrate_expenses(db, batch_size=10, restart=False))
+
+    result = run(migrate_expenses(db, batch_size=10, restart=True))
+
+    assert result["migrated"] == 0
+
+
+def test_unparseable_rows_are_counted_and_kept(db):
+    run(db.expenses.insert_many([
+        legacy(1),
+        legacy(2, date="next tuesday"),
+        {"_id": 3, "expense_id": "e3", "user_id": "u", "date": "2024-03-05"},
+        legacy(4),
+    ]))
+
+    result = run(migrate_expenses(db, batch_size=10, restart=False))
+
+    assert result["migrated"] == 2
+    assert result["failed"] == 2
+    assert run(db.expenses.find_one({"_id": 2}))["date"] == "next tuesday"
+
+
+def test_resumes_from_checkpoint(db, monkeypatch):
+    run(db.expenses.insert_many([legacy(index) for index in range(1, 6)]))
+    real_update = manage.migration_update
+
+    def interrupted_after_two(expense):
+        if expense["_id"] > 2:
+            raise KeyboardInterrupt
+        return real_update(expense)
+
+    monkeypatch.setattr(manage, "migration_update", interrupted_after_two)
+    with pytest.raises(KeyboardInterrupt):
+        run(migrate_expenses(db, batch_size=2, restart=False))
+    state = run(db.migrations.find_one({"_id": EXPENSES_MIGRATION_ID}))
+    assert state["last_id"] == 2
+
+    seen = []
+
+    def recording(expense):
+        seen.append(expense["_id"])
+        return real_update(expense)
+
+    monkeypatch.setattr(manage, "migration_update", recording)
+    result = run(migrate_expenses(db, batch_size=2, restart=False))
+
+    assert seen == [3, 4, 5]
+    assert result["migrated"] == 5
+    assert run(db.expenses.count_documents({"amount": {"$exists": True}})) == 0
+
+
+class EditedBeforeWrite:
+    """Expenses collection where the API rewrites an expense between the read and the bulk write."""
+
+    def __init__(self, collection, edit):
+        self._collection = collection
+        self._edit = edit
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    async def bulk_write(self, operations, **kwargs):
+        await self._collection.update_one(*self._edit)
+        return await self._collection.bulk_write(operations, **kwargs)
+
+
+def test_concurrently_edited_document_is_skipped(db):
+    run(db.expenses.insert_many([legacy(1), legacy(2)]))
+    edit = ({"_id": 1}, {"$set": {"date": "2024-04-01", "amount": 99.0}})
+    racing = SimpleNamespace(expenses=EditedBeforeWrite(db.expenses, edit), migrations=db.migrations)
+
+    result = run(migrate_expenses(racing, batch_size=10, restart=False))
+
+    assert result["migrated"] == 1
+    edited = run(db.expenses.find_one({"_id": 1}))
+    assert edited["date"] == "2024-04-01"
+    assert edited["amount"] == 99.0
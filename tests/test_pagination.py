@@ -0,0 +1,32 @@
+import pytest
+from fastapi import HTTPException
+
+from pagination import decode_cursor, descending_after, encode_cursor
+
+
+def test_cursor_round_trip():
+    token = encode_cursor("2024-03-05", "e1")
+
+    assert "=" not in token
+    assert decode_cursor(token, 2) == ["2024-03-05", "e1"]
+
+
+@pytest.mark.parametrize("token", [
+    "not base64!",
+    encode_cursor("2024-03-05"),
+    encode_cursor("2024-03-05", "e1", "extra"),
+    "eyJhIjoxfQ",  # {"a":1}
+    "",
+])
+def test_invalid_cursor_is_a_bad_request(token):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(token, 2)
+
+    assert error.value.status_code == 400
+
+
+def test_descending_after():
+    assert descending_after(["date", "expense_id"], ["2024-03-05", "e1"]) == {"$or": [
+        {"date": {"$lt": "2024-03-05"}},
+        {"date": "2024-03-05", "expense_id": {"$lt": "e1"}},
+    ]}
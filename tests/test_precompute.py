@@ -0,0 +1,75 @@
+import asyncio
+import datetime
+
+from mongomock_motor import AsyncMongoMockClient
+
+from precompute import STATE_ID, RecommendationScheduler
+from recommendations import RecommendationCache
+
+
+def scheduler(**overrides):
+    options = {"interval": 0, "concurrency": 1, "max_per_run": 10, "lease_seconds": 600}
+    options.update(overrides)
+    return RecommendationScheduler(RecommendationCache(ttl=60), **options)
+
+
+async def seed(db, users):
+    now = datetime.datetime.utcnow()
+    await db.user_setups.insert_many([{"user_id": user, "updated_at": now} for user in users])
+    # Inactive users are walked and skipped without an LLM call
+    await db.users.insert_many([{"user_id": user, "subscription_status": "inactive"} for user in users])
+
+
+def test_checkpoints_renew_the_lease():
+    db = AsyncMongoMockClient()["precompute"]
+
+    async def scenario():
+        await seed(db, ["a", "b"])
+        await db.scheduler_state.insert_one({"_id": STATE_ID, "lease_until": None})
+        leases = []
+        real_checkpoint = RecommendationScheduler._checkpoint
+
+        async def checkpoint(self, db, owner, run_started, last_user_id):
+            await real_checkpoint(self, db, owner, run_started, last_user_id)
+            leases.append((await db.scheduler_state.find_one({"_id": STATE_ID}))["lease_until"])
+
+        runner = scheduler()
+        runner._checkpoint = checkpoint.__get__(runner)
+        result = await runner.run_once(db, None)
+        return result, leases, await db.scheduler_state.find_one({"_id": STATE_ID})
+
+    result, leases, state = asyncio.run(scenario())
+
+    assert result["status"] == "finished"
+    assert len(leases) == 2 and all(lease > datetime.datetime.utcnow() for lease in leases)
+    assert state["lease_until"] is None and "owner" not in state
+
+
+def test_run_stops_when_the_lease_is_taken_over():
+    db = AsyncMongoMockClient()["precompute"]
+    other_lease = datetime.datetime(2100, 1, 1)
+
+    async def scenario():
+        await seed(db, ["a", "b", "c"])
+        runner = scheduler()
+        real_candidates = runner._candidates
+
+        async def candidates(db, since, after):
+            found = await real_candidates(db, since, after)
+            # The lease expired and another worker claimed it
+            await db.scheduler_state.update_one(
+                {"_id": STATE_ID}, {"$set": {"owner": "other", "lease_until": other_lease}}
+            )
+            return found
+
+        runner._candidates = candidates
+        result = await runner.run_once(db, None)
+        return result, await db.scheduler_state.find_one({"_id": STATE_ID})
+
+    result, state = asyncio.run(scenario())
+
+    assert result["status"] == "lost"
+    assert result["skipped"] == 1
+    assert state["owner"] == "other"
+    assert state["lease_until"] == other_lease
+    assert "last_user_id" not in state
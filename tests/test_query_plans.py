@@ -0,0 +1,84 @@
+import datetime
+import os
+import uuid
+
+import pytest
+from pymongo import DESCENDING, MongoClient
+from pymongo.errors import PyMongoError
+
+from indexes import HOT_QUERIES, INDEXES
+from pagination import descending_after
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+
+
+@pytest.fixture(scope="module")
+def db():
+    client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        pytest.skip(f"MongoDB not reachable at {MONGO_URL}")
+
+    name = f"query_plans_{uuid.uuid4().hex[:8]}"
+    database = client[name]
+    for collection, models in INDEXES.items():
+        database[collection].create_indexes(models)
+    yield database
+    client.drop_database(name)
+    client.close()
+
+
+def plan_stages(plan):
+    """Yield every stage name in a winning plan tree."""
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from plan_stages(child)
+
+
+@pytest.mark.parametrize(
+    "route,collection,query,sort", HOT_QUERIES, ids=[q[0] + ":" + q[1] for q in HOT_QUERIES]
+)
+def test_hot_query_uses_index(db, route, collection, query, sort):
+    cursor = db[collection].find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    winning_plan = cursor.explain()["queryPlanner"]["winningPlan"]
+
+    assert "COLLSCAN" not in set(plan_stages(winning_plan)), (
+        f"{route} scans {collection} for {query}"
+    )
+
+
+@pytest.mark.parametrize("depth", [100, 4000])
+def test_expense_page_examines_bounded_keys(db, depth):
+    """A keyset page costs about ``limit`` index keys however deep it is."""
+    limit = 50
+    start = datetime.datetime(2020, 1, 1)
+    if db.expenses.count_documents({"user_id": "deep"}) == 0:
+        db.expenses.insert_many([
+            {"expense_id": f"{i:08d}", "user_id": "deep",
+             "date": start + datetime.timedelta(days=i // 3), "amount_cents": 100}
+            for i in range(5000)
+        ] + [
+            {"expense_id": f"other{i:08d}", "user_id": "other",
+             "date": start + datetime.timedelta(days=i // 3), "amount_cents": 100}
+            for i in range(2000)
+        ])
+    sort = [("date", DESCENDING), ("expense_id", DESCENDING)]
+    last = db.expenses.find({"user_id": "deep"}).sort(sort).skip(depth - 1).limit(1).next()
+    query = {"$and": [
+        {"user_id": "deep"},
+        descending_after(["date", "expense_id"], [last["date"], last["expense_id"]]),
+    ]}
+
+    stats = db.expenses.find(query).sort(sort).limit(limit + 1).explain()["executionStats"]
+
+    assert stats["nReturned"] == limit + 1
+    assert stats["totalDocsExamined"] <= 2 * (limit + 1)
+    assert stats["totalKeysExamined"] <= 3 * (limit + 1), (
+        f"page at depth {depth} examined {stats['totalKeysExamined']} keys"
+    )
@@ -0,0 +1,109 @@
+import pytest
+
+from statements import as_expenses, parse_amount, parse_date, parse_statement, parse_text_lines
+
+
+@pytest.mark.parametrize("value,expected", [
+    ("2024-03-05", "2024-03-05"),
+    ("03/05/2024", "2024-03-05"),
+    ("03/05/24", "2024-03-05"),
+    ("5 Mar 2024", "2024-03-05"),
+    ("Mar 5, 2024", "2024-03-05"),
+    ("20240305", "2024-03-05"),
+    ("  2024/03/05 ", "2024-03-05"),
+    ("2024-13-05", None),
+    ("yesterday", None),
+])
+def test_parse_date(value, expected):
+    assert parse_date(value) == expected
+
+
+@pytest.mark.parametrize("value,expected", [
+    ("12.50", 12.5),
+    ("-4.50", -4.5),
+    ("$1,234.56", 1234.56),
+    ("(4.50)", -4.5),
+    ("", None),
+    ("n/a", None),
+])
+def test_parse_amount(value, expected):
+    assert parse_amount(value) == expected
+
+
+def transaction(amount):
+    return {"date": "2024-03-05", "amount": amount, "description": "", "category": ""}
+
+
+def test_as_expenses_bank_export_keeps_spending():
+    # Negative amounts anywhere: spending is negative, deposits are dropped
+    expenses = as_expenses([transaction(-4.5), transaction(2000.0), transaction(-0.1 - 0.2)])
+
+    assert [expense["amount"] for expense in expenses] == [4.5, 0.3]
+
+
+def test_as_expenses_card_export_keeps_purchases():
+    expenses = as_expenses([transaction(12.345), transaction(0.0)])
+
+    assert [expense["amount"] for expense in expenses] == [12.35]
+
+
+def test_parse_csv_with_debit_column(tmp_path):
+    # Excel's UTF-8 export starts with a byte order mark
+    path = tmp_path / "statement.csv"
+    path.write_text(
+        "\ufeffPosted Date,Payee,Debit,Credit,Category\n"
+        "03/05/2024,COFFEE SHOP,4.50,,Dining\n"
+        "03/06/2024,PAYROLL,,2000.00,\n"
+        "not a date,BROKEN,1.00,,\n",
+        encoding="utf-8",
+    )
+
+    assert parse_statement(str(path), "statement.csv") == [
+        {"date": "2024-03-05", "amount": 4.5, "description": "COFFEE SHOP", "category": "Dining"},
+    ]
+
+
+def test_parse_csv_without_amount_column(tmp_path):
+    path = tmp_path / "statement.csv"
+    path.write_text("Date,Description\n2024-03-05,Coffee\n", encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        parse_statement(str(path), "statement.csv")
+
+
+def test_parse_ofx_unclosed_transactions(tmp_path):
+    # SGML-style OFX leaves STMTTRN and field tags unclosed
+    path = tmp_path / "statement.qfx"
+    path.write_text(
+        "<OFX><BANKTRANLIST>"
+        "<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240305120000<TRNAMT>-4.50<NAME>COFFEE SHOP\n"
+        "<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240306<TRNAMT>2000.00<MEMO>PAYROLL\n"
+        "</BANKTRANLIST></OFX>",
+        encoding="utf-8",
+    )
+
+    assert parse_statement(str(path), "statement.QFX") == [
+        {"date": "2024-03-05", "amount": 4.5, "description": "COFFEE SHOP", "category": ""},
+    ]
+
+
+def test_parse_text_lines():
+    lines = [
+        "Statement period 03/01/2024 - 03/31/2024",
+        "2024-03-05  COFFEE SHOP #12  -4.50",
+        "03/07/2024 GROCERY STORE ($1,204.10)",
+        "Total -1,208.60",
+    ]
+
+    assert parse_text_lines(lines) == [
+        {"date": "2024-03-05", "amount": -4.5, "description": "COFFEE SHOP #12", "category": ""},
+        {"date": "2024-03-07", "amount": -1204.1, "description": "GROCERY STORE", "category": ""},
+    ]
+
+
+def test_unsupported_extension(tmp_path):
+    path = tmp_path / "statement.xlsx"
+    path.write_bytes(b"")
+
+    with pytest.raises(ValueError):
+        parse_statement(str(path), "statement.xlsx")